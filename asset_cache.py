@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+from PIL import Image
+
+
+def image_nbytes(img: Image.Image) -> int:
+    """Approximate memory held by a decoded image."""
+    return img.width * img.height * len(img.getbands())
+
+
+class AssetCache:
+    """
+    Thread-safe LRU cache of decoded assets bounded by a byte budget.
+    Values are shared: callers must copy images before drawing on them.
+    """
+    def __init__(self, max_bytes: int = 128 * 1024**2):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any],
+                    size_of: Callable[[Any], int] = image_nbytes) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = loader()
+        size = size_of(value)
+        if size > self.max_bytes:
+            return value  # larger than the whole budget: don't let it flush everything else
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (value, size)
+                self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._bytes}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
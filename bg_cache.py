@@ -0,0 +1,88 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+Color = Tuple[int, int, int]
+
+
+class BackgroundCache:
+    """
+    Bounded LRU cache of generated backgrounds with an optional on-disk tier.
+
+    Entries are keyed by (generator name, quantized colors, canvas size).
+    Colors are snapped to the center of a color_step bucket before the generator
+    is called, so every product falling into the same bucket gets the same background.
+    """
+    def __init__(self, max_entries: int = 32, disk_dir: Optional[str] = None, color_step: int = 4):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.color_step = max(1, color_step)
+        self._entries: "OrderedDict[tuple, Image.Image]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def quantize(self, color: Color) -> Color:
+        step = self.color_step
+        return tuple(min(255, int(c) // step * step + step // 2) for c in color)
+
+    def make_key(self, generator: str, colors: Tuple[Color, ...], size: Tuple[int, int]) -> tuple:
+        return (generator, tuple(self.quantize(c) for c in colors), tuple(size))
+
+    def _disk_path(self, key: tuple) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{key[0]}_{digest}.png")
+
+    def _remember(self, key: tuple, img: Image.Image) -> None:
+        with self._lock:
+            self._entries[key] = img
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_create(self, generator: str, factory: Callable[..., Image.Image], width: int, height: int,
+                      *colors: Color) -> Image.Image:
+        """Returns a private copy of the cached background, calling factory(width, height, *colors) on a miss."""
+        key = self.make_key(generator, colors, (width, height))
+        with self._lock:
+            img = self._entries.get(key)
+            if img is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return img.copy()
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                img = Image.open(path)
+                img.load()
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, img)
+                return img.copy()
+
+        with self._lock:
+            self.misses += 1
+        img = factory(width, height, *key[1])
+        self._remember(key, img)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            img.save(tmp_path, format="PNG", compress_level=1)
+            os.replace(tmp_path, path)
+        return img.copy()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "entries": len(self._entries)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
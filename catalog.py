@@ -0,0 +1,187 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+TEXT_FIELDS = ("title", "subtitle", "price")
+STATUSES = ("ok", "failed")
+
+
+class CatalogError(ValueError):
+    """A manifest line that isn't a valid product record; the message names the line."""
+
+
+class CatalogRecord(NamedTuple):
+    """
+    One product of a catalog manifest.
+    key identifies the record across runs: its "id" (or "sku") field, else a hash of the whole record,
+    so an edited record counts as new work. Texts that are missing stay None (the renderer's defaults apply).
+    """
+    key: str
+    line: int
+    image: str                    # absolute path, or relative to the manifest's folder
+    title: Optional[str]
+    subtitle: Optional[str]
+    price: Optional[str]
+    layouts: Optional[List[Any]]  # None: every layout
+
+    @property
+    def texts(self) -> Dict[str, str]:
+        return {name: getattr(self, name) for name in TEXT_FIELDS if getattr(self, name) is not None}
+
+    @property
+    def name(self) -> str:
+        """File-system safe name for the record's output folder."""
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in self.key)
+        return safe.strip(".") or "record"
+
+
+def parse_record(line: str, line_no: int, base_dir: str = ".") -> CatalogRecord:
+    """Validates one manifest line: {"image": ..., "title"?, "subtitle"?, "price"?, "layouts"?, "id"?}."""
+    try:
+        data = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise CatalogError(f"line {line_no}: invalid JSON ({e})") from None
+    if not isinstance(data, dict):
+        raise CatalogError(f"line {line_no}: expected an object")
+    image = data.get("image")
+    if not isinstance(image, str) or not image:
+        raise CatalogError(f"line {line_no}: 'image' must be a non-empty string")
+    texts = {}
+    for name in TEXT_FIELDS:
+        value = data.get(name)
+        if value is not None and not isinstance(value, (str, int, float)):
+            raise CatalogError(f"line {line_no}: '{name}' must be a string")
+        texts[name] = None if value is None else str(value)
+    layouts = data.get("layouts")
+    if layouts is not None and (not isinstance(layouts, list) or not layouts):
+        raise CatalogError(f"line {line_no}: 'layouts' must be a non-empty list")
+
+    key = data.get("id", data.get("sku"))
+    if key is None:
+        stem = os.path.splitext(os.path.basename(image))[0]
+        digest = hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+        key = f"{stem}-{digest[:10]}"
+    path = image if os.path.isabs(image) else os.path.join(base_dir, image)
+    return CatalogRecord(str(key), line_no, path, texts["title"], texts["subtitle"], texts["price"], layouts)
+
+
+def read_manifest(path: str) -> Iterator[Tuple[int, str]]:
+    """Streams (line number, line) of a JSONL manifest, skipping blank lines and # comments."""
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line_no, line
+
+
+class ResultsLog:
+    """
+    Append-only JSONL journal of finished records: one line per record, written and fsync'ed as soon as
+    the record is done, so after a crash at most the record in progress is lost.
+    Opening an existing journal loads the finished keys and drops a half-written last line.
+    """
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self.done: Dict[str, str] = {}  # key -> status of its last result
+        if os.path.exists(path):
+            self._load()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self) -> None:
+        valid = 0
+        with open(self.path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # interrupted write
+                try:
+                    entry = json.loads(raw)
+                    self.done[entry["key"]] = entry["status"]
+                except (ValueError, KeyError, TypeError):
+                    break
+                valid += len(raw)
+        if valid < os.path.getsize(self.path):
+            logger.warning(f"{self.path}: dropping an incomplete entry at byte {valid}")
+            with open(self.path, "r+b") as f:
+                f.truncate(valid)
+
+    def completed(self, retry_failed: bool = False) -> Set[str]:
+        """Keys to skip on resume: finished ones, and failed ones too unless retry_failed."""
+        return {key for key, status in self.done.items() if status == "ok" or not retry_failed}
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.done[entry["key"]] = entry["status"]
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "ResultsLog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class CatalogSummary(NamedTuple):
+    ok: int
+    failed: int
+    skipped: int  # already finished in an earlier run
+    seconds: float
+
+
+def run_catalog(manifest: str, results: str, render: Callable[[CatalogRecord], Dict[str, str]],
+                retry_failed: bool = False, fsync: bool = True) -> CatalogSummary:
+    """
+    Streams the manifest and calls render(record) -> {layout: output path} for every record not yet in
+    the results journal, appending one result line per record. Restarting with the same journal resumes
+    after the last finished record. Invalid lines and render errors are journaled as "failed"
+    (and retried on the next run with retry_failed).
+    """
+    start = time.perf_counter()
+    base_dir = os.path.dirname(os.path.abspath(manifest))
+    ok = failed = skipped = 0
+    with ResultsLog(results, fsync) as log:
+        completed = log.completed(retry_failed)
+        if completed:
+            logger.info(f"Resuming: {len(completed)} records already in {results}")
+        for line_no, line in read_manifest(manifest):
+            t = time.perf_counter()
+            try:
+                record = parse_record(line, line_no, base_dir)
+            except CatalogError as e:
+                key = f"line-{line_no}"
+                if key in completed:
+                    skipped += 1
+                    continue
+                logger.error(f"{manifest}: {e}")
+                log.write({"key": key, "line": line_no, "status": "failed", "error": str(e)})
+                failed += 1
+                continue
+            if record.key in completed:
+                skipped += 1
+                continue
+            entry = {"key": record.key, "line": line_no, "image": record.image}
+            try:
+                outputs = render(record)
+                entry.update(status="ok", outputs=outputs)
+                ok += 1
+            except Exception as e:
+                logger.error(f"{record.key} ({record.image}): {e}")
+                entry.update(status="failed", error=f"{type(e).__name__}: {e}")
+                failed += 1
+            entry["seconds"] = round(time.perf_counter() - t, 3)
+            log.write(entry)
+            completed.add(record.key)  # a key repeated later in the manifest is done once
+    summary = CatalogSummary(ok, failed, skipped, time.perf_counter() - start)
+    logger.info(f"Catalog done: {ok} ok, {failed} failed, {skipped} skipped in {summary.seconds:.1f}s")
+    return summary
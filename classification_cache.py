@@ -0,0 +1,71 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+Top5 = List[Tuple[str, float]]
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of the file contents."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ClassificationCache:
+    """
+    SQLite cache of classifier results keyed by image content hash and model identifier.
+    Stores the top-5 labels and the product type mapped from them.
+    """
+    def __init__(self, db_path: str = ".classification_cache.sqlite"):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS classifications ("
+                " content_hash TEXT NOT NULL,"
+                " model_id TEXT NOT NULL,"
+                " top5 TEXT NOT NULL,"
+                " product_type TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " PRIMARY KEY (content_hash, model_id))"
+            )
+
+    def get(self, content_hash: str, model_id: str) -> Optional[Tuple[Top5, str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT top5, product_type FROM classifications WHERE content_hash = ? AND model_id = ?",
+                (content_hash, model_id),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        top5 = [(label, prob) for label, prob in json.loads(row[0])]
+        return top5, row[1]
+
+    def put(self, content_hash: str, model_id: str, top5: Top5, product_type: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO classifications VALUES (?, ?, ?, ?, ?)",
+                (content_hash, model_id, json.dumps(top5), product_type, time.time()),
+            )
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hit_rate, 3)}
+
+    def close(self) -> None:
+        self._conn.close()
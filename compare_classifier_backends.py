@@ -0,0 +1,60 @@
+"""
+Compares ProductClassifier backends on a folder of images: per-image latency and how
+often the product type (map_to_product_type) and the top-1 label agree with fp32.
+
+    python compare_classifier_backends.py --input inputs --backends fp32 int8 onnx
+"""
+import argparse
+import logging
+import os
+import time
+
+from generateBgFromFolder import CLASSIFIER_BACKENDS, IMAGE_EXTENSIONS, ProductClassifier
+
+logger = logging.getLogger(__name__)
+
+
+def run_backend(backend: str, paths, batch_size: int, workers: int):
+    classifier = ProductClassifier(backend=backend)
+    _ = classifier.model  # load outside the timed region
+    if paths:
+        classifier.classify_batch(paths[:1], batch_size, workers)  # warm-up
+    start = time.perf_counter()
+    results = classifier.classify_batch(paths, batch_size, workers)
+    elapsed = time.perf_counter() - start
+    types = [classifier.map_to_product_type(top5) for top5 in results]
+    return results, types, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare classifier backends against fp32.")
+    parser.add_argument("--input", default="inputs", help="Folder of product photos")
+    parser.add_argument("--backends", nargs="+", choices=CLASSIFIER_BACKENDS, default=list(CLASSIFIER_BACKENDS))
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--decode-workers", type=int, default=4)
+    args = parser.parse_args()
+
+    paths = sorted(os.path.join(args.input, f) for f in os.listdir(args.input)
+                   if f.lower().endswith(IMAGE_EXTENSIONS))
+    if not paths:
+        logger.error(f"No images in {args.input}")
+        return
+
+    backends = ["fp32"] + [b for b in args.backends if b != "fp32"]
+    ref_results = ref_types = None
+    print(f"{'backend':8} {'ms/image':>9} {'img/s':>7} {'type agree':>11} {'top1 agree':>11}")
+    for backend in backends:
+        results, types, elapsed = run_backend(backend, paths, args.batch_size, args.decode_workers)
+        if ref_results is None:
+            ref_results, ref_types = results, types
+        n = len(paths)
+        type_agree = sum(a == b for a, b in zip(types, ref_types)) / n
+        top1_agree = sum(bool(a) and bool(b) and a[0][0] == b[0][0] for a, b in zip(results, ref_results)) / n
+        print(f"{backend:8} {1000 * elapsed / n:9.1f} {n / elapsed:7.1f} {type_agree:11.1%} {top1_agree:11.1%}")
+        for path, a, b in zip(paths, types, ref_types):
+            if a != b:
+                print(f"    {os.path.basename(path)}: {backend}={a} fp32={b}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Union
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+STORE_MODES = ("rgba", "alpha")
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass  # already evicted by a concurrent run
+
+
+class CutoutCache:
+    """
+    Content-addressed on-disk cache of background-removal results.
+
+    Keys are a SHA-256 over the input file bytes, the segmentation model name and
+    its parameters, so a changed photo or model never returns a stale cut-out.
+    Entries are stored either as the full RGBA cut-out or as the alpha mask only
+    (about 4x smaller); masks are re-applied to the original image on load.
+    """
+    def __init__(self, cache_dir: str = ".cutout_cache", store: str = "rgba",
+                 max_bytes: Optional[int] = 2 * 1024**3, max_age_days: Optional[float] = None):
+        if store not in STORE_MODES:
+            raise ValueError(f"store must be one of {STORE_MODES}, got {store!r}")
+        self.cache_dir = cache_dir
+        self.store = store
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400 if max_age_days is not None else None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = self.evict()
+
+    @staticmethod
+    def make_key(data: bytes, model_name: str, params: Optional[Dict] = None) -> str:
+        h = hashlib.sha256(data)
+        h.update(model_name.encode("utf-8"))
+        h.update(json.dumps(params or {}, sort_keys=True, default=str).encode("utf-8"))
+        return h.hexdigest()
+
+    def _path(self, key: str, store: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{store}.png")
+
+    def get(self, key: str, original: Union[Image.Image, Callable[[], Image.Image]]) -> Optional[Image.Image]:
+        """
+        Returns the cached RGBA cut-out for key, or None. original is needed to rebuild alpha-only entries;
+        pass a callable to decode it only when such an entry is hit.
+        """
+        for store in STORE_MODES:
+            path = self._path(key, store)
+            if not os.path.exists(path):
+                continue
+            try:
+                img = Image.open(path)
+                img.load()
+            except OSError as e:
+                logger.warning(f"Dropping unreadable cut-out cache entry {path}: {e}")
+                _unlink(path)
+                continue
+            os.utime(path)  # refresh for LRU-by-mtime eviction
+            with self._lock:
+                self.hits += 1
+            if store == "alpha":
+                if callable(original):
+                    original = original()
+                # Same composite rembg uses for its naive cut-out
+                img = Image.composite(original.convert("RGBA"), Image.new("RGBA", original.size, 0), img)
+            return img
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, cutout: Image.Image) -> None:
+        path = self._path(key, self.store)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        img = cutout.getchannel("A") if self.store == "alpha" else cutout.convert("RGBA")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        img.save(tmp_path, format="PNG", compress_level=1)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._total_bytes += os.path.getsize(path)
+            over_budget = self.max_bytes is not None and self._total_bytes > self.max_bytes
+        if over_budget:
+            total = self.evict()
+            with self._lock:
+                self._total_bytes = total
+
+    def evict(self) -> int:
+        """Drops entries older than max_age, then least recently used ones above max_bytes. Returns bytes kept."""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for f in files:
+                if f.endswith(".png"):
+                    path = os.path.join(root, f)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+
+        now = time.time()
+        kept = []
+        for mtime, size, path in entries:
+            if self.max_age is not None and now - mtime > self.max_age:
+                _unlink(path)
+            else:
+                kept.append((mtime, size, path))
+
+        total = sum(size for _, size, _ in kept)
+        if self.max_bytes is not None and total > self.max_bytes:
+            for mtime, size, path in sorted(kept):
+                _unlink(path)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        return total
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "bytes": self._total_bytes}
@@ -0,0 +1,114 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageFilter
+
+
+BLUR_MODES = ("exact", "fast")
+
+# Quality knob of the fast mode: the blur radius left after downsampling. Lower is faster and
+# less accurate; a radius below 2 * min_radius is always blurred exactly.
+DEFAULT_MIN_RADIUS = 3.0
+
+
+def fast_gaussian_blur(img: Image.Image, radius: float, min_radius: float = DEFAULT_MIN_RADIUS) -> Image.Image:
+    """
+    Approximates img.filter(GaussianBlur(radius)) by box-downsampling by radius // min_radius,
+    blurring the small image at the reduced radius and scaling it back up bilinearly.
+    There is no fixed bound on the difference from the exact blur: it grows with high-frequency content.
+    Measured worst cases per channel (0-255) at 900x1200 with min_radius=3: 4 on ellipse and rectangle
+    masks (shadow/glow, r=10..30), 14 on the cloud, 13 on the bokeh and 10 on the glass backgrounds
+    (6 colors x 4 seeds each), 19 on uniform RGB noise (r=10..30); mean difference below 0.35 in all of them.
+    """
+    factor = int(radius // min_radius)
+    if factor < 2:
+        return img.filter(ImageFilter.GaussianBlur(radius))
+    w, h = img.size
+    small = img.resize((max(1, -(-w // factor)), max(1, -(-h // factor))), Image.BOX)
+    small = small.filter(ImageFilter.GaussianBlur(radius / factor))
+    return small.resize((w, h), Image.BILINEAR)
+
+
+def blur(img: Image.Image, radius: float, mode: str = "exact", min_radius: float = DEFAULT_MIN_RADIUS) -> Image.Image:
+    """
+    Gaussian blur; mode "fast" is quicker, with a typically sub-level mean error but no fixed maximum
+    (see fast_gaussian_blur).
+    """
+    if mode == "fast":
+        return fast_gaussian_blur(img, radius, min_radius)
+    if mode != "exact":
+        raise ValueError(f"Unknown blur mode: {mode} (expected one of {BLUR_MODES})")
+    return img.filter(ImageFilter.GaussianBlur(radius))
+
+
+def threshold_lut(value: int) -> List[int]:
+    """Point table mapping 0 -> 0 and everything else -> value (the old `lambda p: p > 0 and value`)."""
+    return [0] + [value] * 255
+
+
+def silhouette(product: Image.Image) -> Image.Image:
+    """Binary "L" mask of the product: 255 wherever convert("L") is non-zero."""
+    return product.convert("L").point(threshold_lut(255))
+
+
+def make_shadow(product: Image.Image, opacity: int, radius: float, mask: Optional[Image.Image] = None,
+                blur_mode: str = "exact", min_radius: float = DEFAULT_MIN_RADIUS) -> Image.Image:
+    """
+    Soft "L" layer from the product silhouette: threshold to opacity, then Gaussian blur.
+    mask is a precomputed silhouette(product), which saves the RGBA -> L conversion.
+    """
+    if mask is None:
+        mask = silhouette(product)
+    return blur(mask.point(threshold_lut(opacity)), radius, blur_mode, min_radius)
+
+
+class ProductEffects:
+    """
+    Shadow/glow layers of one product, computed once per (size, opacity, radius) and shared
+    by all variants rendering that product. Use one instance per product; returned layers
+    are shared and must not be modified. blur_mode/min_radius select the blur (see blur()).
+    """
+    def __init__(self, blur_mode: str = "exact", min_radius: float = DEFAULT_MIN_RADIUS):
+        if blur_mode not in BLUR_MODES:
+            raise ValueError(f"Unknown blur mode: {blur_mode} (expected one of {BLUR_MODES})")
+        self.blur_mode = blur_mode
+        self.min_radius = min_radius
+        self._layers: Dict[Tuple, Image.Image] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: Tuple, build) -> Image.Image:
+        with self._lock:
+            layer = self._layers.get(key)
+            if layer is not None:
+                self.hits += 1
+                return layer
+            self.misses += 1
+        layer = build()
+        with self._lock:
+            return self._layers.setdefault(key, layer)
+
+    def silhouette(self, product: Image.Image) -> Image.Image:
+        return self._get(("silhouette", product.size), lambda: silhouette(product))
+
+    def shadow(self, product: Image.Image, opacity: int, radius: float) -> Image.Image:
+        mask = self.silhouette(product)
+        return self._get(("shadow", product.size, opacity, radius),
+                         lambda: make_shadow(product, opacity, radius, mask, self.blur_mode, self.min_radius))
+
+    # A glow is the same blurred silhouette, pasted around the product instead of offset behind it
+    glow = shadow
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "layers": len(self._layers)}
+
+    def __getstate__(self):
+        # Locks can't be pickled (process executors); counters and layers travel as-is
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
@@ -0,0 +1,142 @@
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional
+
+from classification_cache import file_hash
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_FILE = ".fingerprints.json"
+
+_PLAIN = (str, int, float, bool, type(None))
+
+
+def digest(value: Any) -> str:
+    """SHA-256 of a JSON-serializable value in canonical form (sorted keys, tuples as lists)."""
+    data = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=repr)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def derive_seed(*parts: Any) -> int:
+    """Stable 64-bit seed from JSON-serializable parts: the same parts give the same seed in every process."""
+    return int(digest(list(parts))[:16], 16)
+
+
+def folder_digest(folder: str, extensions: Optional[Iterable[str]] = None) -> str:
+    """Digest of the names and contents of the files directly in folder (optionally only these extensions)."""
+    if not os.path.isdir(folder):
+        return digest(None)
+    exts = tuple(e.lower() for e in extensions) if extensions else None
+    files = sorted(f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f))
+                   and (exts is None or f.lower().endswith(exts)))
+    return digest([(f, file_hash(os.path.join(folder, f))) for f in files])
+
+
+def _is_plain(value: Any) -> bool:
+    if isinstance(value, _PLAIN):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_plain(v) for v in value)
+    if isinstance(value, dict):
+        return all(isinstance(k, _PLAIN) and _is_plain(v) for k, v in value.items())
+    return False
+
+
+def _code_names(code) -> Iterable[str]:
+    yield from code.co_names
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            yield from _code_names(const)
+
+
+def _source_file(obj: Any) -> Optional[str]:
+    try:
+        return os.path.abspath(inspect.getsourcefile(obj))
+    except TypeError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def code_fingerprint(*roots: Any) -> str:
+    """
+    Version of the code behind roots (functions or classes): a hash of their source and, recursively,
+    of every function, class and plain setting (numbers, strings, lists and dicts of them) of the same
+    project they refer to by name. Editing a layout, a helper it calls or a setting it reads changes it;
+    editing unrelated code doesn't. Computed once per process.
+    Settings only held inside object instances (e.g. a cache built from a setting) are not seen:
+    callers must fingerprint those themselves.
+    """
+    project = os.path.dirname(_source_file(roots[0]) or os.getcwd())
+    parts: Dict[str, str] = {}
+    stack = list(roots)
+    seen = set()
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        path = _source_file(obj)
+        if path is None or not path.startswith(project + os.sep):
+            continue  # builtins, the standard library and installed packages
+        parts[f"{obj.__module__}.{obj.__qualname__}"] = inspect.getsource(obj)
+        if inspect.isclass(obj):
+            members = [m.__func__ if isinstance(m, (staticmethod, classmethod)) else m for m in vars(obj).values()]
+            functions = [m for m in members if inspect.isfunction(m)]
+        else:
+            functions = [obj]
+        for func in functions:
+            namespace = func.__globals__
+            for name in set(_code_names(func.__code__)):
+                if name not in namespace:
+                    continue
+                value = namespace[name]
+                if inspect.isfunction(value) or inspect.isclass(value):
+                    stack.append(value)
+                elif _is_plain(value):
+                    parts[f"{func.__module__}.{name}"] = repr(value)
+    return digest(parts)
+
+
+class FingerprintStore:
+    """
+    Fingerprints of the cards in one output folder, kept in FINGERPRINT_FILE there:
+    {card name: {"fingerprint": ..., "path": ...}}. A card is current when its file still exists
+    and was rendered from inputs with the same fingerprint.
+    """
+    def __init__(self, folder: str):
+        self.path = os.path.join(folder, FINGERPRINT_FILE)
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, str]] = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable {self.path}: {e}")
+
+    def is_current(self, name: str, fingerprint: str) -> bool:
+        entry = self.entries.get(name)
+        return bool(entry) and entry.get("fingerprint") == fingerprint and os.path.exists(entry.get("path", ""))
+
+    def output(self, name: str) -> Optional[str]:
+        entry = self.entries.get(name)
+        return entry.get("path") if entry else None
+
+    def record(self, name: str, fingerprint: str, path: str) -> None:
+        with self._lock:
+            self.entries[name] = {"fingerprint": fingerprint, "path": path}
+
+    def save(self) -> None:
+        """Writes the store atomically (readers never see a half-written file)."""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
@@ -1,9 +1,23 @@
 import os
 import math
-import random
+from functools import partial
 import numpy as np
-from rembg import remove
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from PIL import Image, ImageDraw
+from gradients import linear_gradient, radial_gradient, diagonal_gradient
+from bg_cache import BackgroundCache
+from asset_cache import AssetCache, image_nbytes
+from cutout_cache import CutoutCache
+from effects import ProductEffects, make_shadow, blur
+from product import prepare_product
+from encoders import Encoder, ImageWriter
+from color_stats import color_stats
+from templates import RenderPlan, load_templates
+from catalog import run_catalog
+from fingerprint import FingerprintStore, code_fingerprint, derive_seed, digest
+from classification_cache import file_hash
+from segmentation import remove_background
+from text_layout import get_font, fit_text
 
 #############################
 #   НАСТРОЙКИ И ПАРАМЕТРЫ  #
@@ -27,6 +41,94 @@ OUTPUT_FOLDER = "Results"
 PRODUCT_AREA_RATIO_MIN = 0.4
 PRODUCT_AREA_RATIO_MAX = 0.5
 
+# Обрезать прозрачные поля вырезки перед раскладкой (площадь считается по самому товару).
+# Выключено: без полей размытие тени и свечения обрезается по краю вырезки
+TRIM_PRODUCT = False
+
+# Кэш фонов: сколько держать в памяти, папка для дискового кэша (None – без диска)
+# и шаг квантования цвета (товары с близким средним цветом получают один фон)
+BG_CACHE_SIZE  = 32
+BG_CACHE_DIR   = None
+BG_COLOR_STEP  = 4
+
+BG_CACHE = BackgroundCache(max_entries=BG_CACHE_SIZE, disk_dir=BG_CACHE_DIR, color_step=BG_COLOR_STEP)
+
+# Кэш слоёв текста (плашки и надписи поверх товара): строятся один раз на вариант, тексты
+# и цветовую корзину (BG_COLOR_STEP) – для товаров с одними текстами и близким цветом
+# карточка сводится к вставке товара, тени и одному наложению слоя. Лимит памяти в МБ
+LAYER_CACHE_MB = 64
+
+LAYER_CACHE = AssetCache(LAYER_CACHE_MB * 1024**2)
+
+# Кэш вырезанных товаров (результатов rembg): папка (None – без кэша),
+# что хранить ("rgba" – картинку целиком, "alpha" – только маску) и лимит размера
+CUTOUT_CACHE_DIR   = ".cutout_cache"
+CUTOUT_CACHE_STORE = "rgba"
+CUTOUT_CACHE_MAX_MB = 2048
+
+# Модель сегментации (u2net, u2netp, isnet, silueta) и потоки onnxruntime (None – по умолчанию).
+# Сессия создаётся один раз на процесс.
+SEG_MODEL         = "u2net"
+SEG_INTRA_THREADS = None
+SEG_INTER_THREADS = None
+
+# Большие фото: SEG_MAX_SIZE – длинная сторона вырезки (фото уменьшается уже при декодировании;
+# 1600 хватает для любых вариантов, кроме очень вытянутых товаров), SEG_PROXY_SIZE – сегментировать
+# копию не больше этого размера и растягивать маску (1024 не меньше входа всех моделей).
+# None – как раньше, в полном разрешении
+SEG_MAX_SIZE   = None
+SEG_PROXY_SIZE = None
+
+# Параллельная отрисовка вариантов: "thread", "process" или None (по очереди),
+# число воркеров (None – по числу ядер) и потоков записи карточек
+VARIANT_EXECUTOR = "thread"
+VARIANT_WORKERS  = None
+SAVE_WORKERS     = 2
+
+# Формат карточек: "png" (PNG_COMPRESS_LEVEL 0-9: 1 – в ~2 раза быстрее и на ~20% больше),
+# "png8" (палитра: в ~4 раза меньше, для плоских макетов), "webp" или "jpeg" (OUTPUT_QUALITY).
+# VARIANT_FORMATS – свой формат для отдельных вариантов, например {6: "png8"}
+OUTPUT_FORMAT      = "png"
+PNG_COMPRESS_LEVEL = 6
+OUTPUT_QUALITY     = 90
+VARIANT_FORMATS    = {}
+
+# Размытие фонов и теней: "exact" – точный GaussianBlur, "fast" – размытие уменьшенной копии
+# (фоны и тени в ~1.5-2 раза быстрее). BLUR_MIN_RADIUS – радиус, остающийся после уменьшения:
+# меньше – быстрее, но грубее. Отличие от точного размытия не ограничено и растёт с мелкими деталями;
+# при 3 худшие замеренные: 4/255 на тенях, 13/255 на bokeh, 14/255 на "облаках", 19/255 на шуме,
+# в среднем < 0.35 (см. effects.fast_gaussian_blur)
+BLUR_MODE       = "exact"
+BLUR_MIN_RADIUS = 3
+
+# Макеты из файла дизайнов (params.json): TEMPLATE_DESIGNS – какие дизайны рисовать
+# дополнительно к вариантам 1-11, например ["designe1"]. Файл проверяется и компилируется
+# один раз, карточки дизайна рисуются для товара без повторного разбора
+TEMPLATE_FILE    = "params.json"
+TEMPLATE_DESIGNS = []
+
+# Каталог: JSONL-манифест, по товару на строку:
+#   {"image": "inputs/mat.jpg", "title": "...", "subtitle": "...", "price": "...", "layouts": [1, 3, "designe1"], "id": "SKU-1"}
+# (пути – от папки манифеста; нет текста – берётся TITLE_TEXT и т.д.; нет layouts – все варианты
+# и TEMPLATE_DESIGNS; нет id – товар узнаётся по содержимому строки).
+# Если CATALOG_FILE задан, main() рендерит весь каталог и дописывает итог каждого товара
+# в CATALOG_RESULTS; повторный запуск пропускает готовые товары и продолжает с места остановки.
+# CATALOG_RETRY_FAILED – повторять ли товары, завершившиеся ошибкой
+CATALOG_FILE         = None
+CATALOG_RESULTS      = os.path.join(OUTPUT_FOLDER, "catalog_results.jsonl")
+CATALOG_RETRY_FAILED = False
+
+# Инкрементальная пересборка: у каждой карточки в папке товара (.fingerprints.json) хранится отпечаток
+# её входов – фото, кода макета (функция варианта, всё, что она вызывает, и настройки, которые она
+# читает), версии макета из файла дизайнов, текстов, настроек вырезки и вывода. Карточки
+# с тем же отпечатком не перерисовываются; если не изменилась ни одна, не делается и вырезка
+INCREMENTAL = True
+
+# Зерно случайных фонов ("облака", bokeh, стекло). Каждая карточка получает своё зерно из SEED,
+# содержимого фото и номера варианта: те же входы дают побайтно ту же карточку. Такие фоны
+# свои у каждого товара и в BG_CACHE не кладутся. None – новые случайные фоны при каждом запуске
+SEED = 0
+
 #############################
 #     ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
 #############################
@@ -47,33 +149,22 @@ def darken_color(color, factor=0.2):
     b = int(b*(1-factor))
     return (r, g, b)
 
-def load_font(path_list, size):
+def accent_color(colors, avg_color):
     """
-    Пытается загрузить шрифт из списка путей. 
-    Если всё не сработает – load_default().
+    Второй по доле цвет палитры товара (colors – ColorStats) для второго цвета фона;
+    у однотонного товара или без палитры – avg_color.
     """
-    for p in path_list:
-        try:
-            return ImageFont.truetype(p, size)
-        except:
-            pass
-    return ImageFont.load_default()
+    if colors is None or len(colors.palette) < 2:
+        return avg_color
+    return colors.palette[1][0]
 
 def load_font_bold(size):
-    """Упрощённая загрузка жирного шрифта (Arial Bold)."""
-    return load_font([
-        "/System/Library/Fonts/Supplemental/Arial Bold.ttf",   # Mac
-        "C:/Windows/Fonts/arialbd.ttf",                       # Win
-        "arialbd.ttf"
-    ], size)
+    """Жирный шрифт (Arial Bold) из общего реестра шрифтов – один объект на размер."""
+    return get_font("bold", size)
 
 def load_font_regular(size):
-    """Упрощённая загрузка обычного шрифта (Arial)."""
-    return load_font([
-        "/System/Library/Fonts/Supplemental/Arial.ttf",        # Mac
-        "C:/Windows/Fonts/arial.ttf",                          # Win
-        "arial.ttf"
-    ], size)
+    """Обычный шрифт (Arial) из общего реестра шрифтов."""
+    return get_font("regular", size)
 
 #############################
 #     ГЕНЕРАЦИЯ ФОНОВ
@@ -97,51 +188,44 @@ def create_radial_gradient(width, height, inner_color, outer_color):
     """
     Радиальный градиент: от центра (inner_color) к краям (outer_color).
     """
-    import math
-    inner = np.array(inner_color, dtype=float)
-    outer = np.array(outer_color, dtype=float)
-
-    result = Image.new("RGB", (width, height), tuple(outer.astype(int)))
-    pix = np.array(result, dtype=np.uint8)
-
-    cx, cy = width // 2, height // 2
-    max_r = math.sqrt(cx**2 + cy**2)
-
-    for y in range(height):
-        for x in range(width):
-            dist = math.sqrt((x - cx)**2 + (y - cy)**2)
-            t = dist / max_r
-            color = (1 - t)*inner + t*outer
-            pix[y, x] = color.clip(0,255)
-    return Image.fromarray(pix, "RGB")
+    return radial_gradient(width, height, inner_color, outer_color)
 
 def create_linear_gradient(width, height, top_color, bottom_color):
     """
     Линейный градиент сверху (top_color) вниз (bottom_color).
     """
-    top = np.array(top_color, dtype=float)
-    bottom = np.array(bottom_color, dtype=float)
+    return linear_gradient(width, height, top_color, bottom_color)
 
-    result = Image.new("RGB", (width, height), tuple(top.astype(int)))
-    pix = np.array(result, dtype=np.uint8)
+def create_diagonal_gradient(width, height, color1, color2):
+    """
+    Диагональный градиент: из левого верхнего угла (color1) в правый нижний (color2).
+    """
+    return diagonal_gradient(width, height, color1, color2)
 
-    for y in range(height):
-        t = y / (height - 1)
-        c = (1 - t)*top + t*bottom
-        pix[y, :] = c.clip(0,255)
-    return Image.fromarray(pix, "RGB")
+def create_diagonal_pattern_background(width, height, color1, color2):
+    """
+    Диагональный градиент + тонкие полупрозрачные диагональные линии поверх.
+    """
+    bg = create_diagonal_gradient(width, height, color1, color2)
+    pattern = Image.new("RGBA", (width, height), (255, 255, 255, 0))
+    pattern_draw = ImageDraw.Draw(pattern)
+    for i in range(0, width + height, 20):
+        pattern_draw.line([(i, 0), (0, i)], fill=(255, 255, 255, 10), width=2)
+    return Image.alpha_composite(bg.convert("RGBA"), pattern).convert("RGB")
 
 
-def create_cloud_background(width, height, base_color):
+def create_cloud_background(width, height, base_color, seed=None):
     """
     Пример "облачного" фона:
       - создаём Noise + Blur + смешивание с base_color
+    Шум – из генератора с зерном seed (None – случайный).
     """
     # 1) Создаём шумовое изображение
-    noise = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
 
     # 2) Превращаем шум в PIL и слегка блюрим
-    noise_img = Image.fromarray(noise, "RGB").filter(ImageFilter.GaussianBlur(10))
+    noise_img = blur(Image.fromarray(noise, "RGB"), 10, BLUR_MODE, BLUR_MIN_RADIUS)
 
     # 3) Заливка базовым цветом
     layer_base = Image.new("RGB", (width, height), base_color)
@@ -161,37 +245,45 @@ def create_cloud_background(width, height, base_color):
 
     final_img = Image.fromarray(out.clip(0,255).astype(np.uint8), "RGB")
     # слегка размоем итог для "облачности"
-    final_img = final_img.filter(ImageFilter.GaussianBlur(5))
+    final_img = blur(final_img, 5, BLUR_MODE, BLUR_MIN_RADIUS)
     return final_img
 
-def create_bokeh_background(width, height, base_color):
+def create_bokeh_background(width, height, base_color, seed=None):
     """
     Создаём bokeh-style фон:
       - заливаем base_color
       - рисуем несколько полупрозрачных кругов разных размеров, позиций
       - Blur
+    Круги – из генератора с зерном seed (None – случайные).
     """
+    rng = np.random.default_rng(seed)
     bg = Image.new("RGB", (width, height), base_color)
     draw = ImageDraw.Draw(bg, "RGBA")
 
     # Рисуем ~30 случайных кругов
     for _ in range(30):
-        radius = random.randint(30, 120)
-        x = random.randint(-radius, width + radius)
-        y = random.randint(-radius, height + radius)
+        radius = int(rng.integers(30, 121))
+        x = int(rng.integers(-radius, width + radius + 1))
+        y = int(rng.integers(-radius, height + radius + 1))
 
         # Случайный цвет, близкий к белому, с альфой
-        c = (255, 255, 255, random.randint(30, 100))
+        c = (255, 255, 255, int(rng.integers(30, 101)))
         draw.ellipse([x-radius, y-radius, x+radius, y+radius], fill=c)
 
     # Слегка размываем
-    bokeh = bg.filter(ImageFilter.GaussianBlur(10))
+    bokeh = blur(bg, 10, BLUR_MODE, BLUR_MIN_RADIUS)
 
     # Добавим чуть-чуть полупрозрачного белого слоя, чтоб сбалансировать
     overlay = Image.new("RGBA", (width, height), (255,255,255,30))
     out = Image.alpha_composite(bokeh.convert("RGBA"), overlay)
     return out.convert("RGB")
 
+def create_glass_background(width, height, base_color, seed=None):
+    """
+    Размытый "облачный" фон для glass morphism (вариант 9).
+    """
+    return blur(create_cloud_background(width, height, base_color, seed), 10, BLUR_MODE, BLUR_MIN_RADIUS)
+
 
 #############################
 #    ВСПОМОГАТЕЛЬНЫЙ РИСУНОК
@@ -204,14 +296,9 @@ def draw_text_with_box(draw, text, x, y, font, box_color=None, text_color="white
     Если max_width задан, автоматически уменьшает шрифт, пока текст не уместится.
     Возвращает (box_w, box_h).
     """
-    while True:
-        bbox = draw.textbbox((0,0), text, font=font)
-        text_w = bbox[2] - bbox[0]
-        text_h = bbox[3] - bbox[1]
-        if max_width is None or text_w <= max_width or font.size <= 10:
-            break
-        # Уменьшаем шрифт
-        font = font.font_variant(size=font.size - 2)
+    # Подбираем размер бинарным поиском по тем же шагам (-2px), замеры кэшируются
+    fit = fit_text(text, font, max_width, min_size=10, step=2)
+    font, text_w, text_h = fit.font, fit.width, fit.height
 
     box_w = text_w + pad_x*2
     box_h = text_h + pad_y*2
@@ -266,23 +353,286 @@ def scale_product_to_area(no_bg, min_area, max_area):
         return no_bg, scale
     return no_bg, 1.0
 
+def shadow_layer(no_bg, opacity, radius, effects=None):
+    """
+    Размытый силуэт товара (тень или свечение) с заданной непрозрачностью.
+    С effects (один ProductEffects на товар) слой считается один раз и делится между вариантами.
+    """
+    if effects is None:
+        return make_shadow(no_bg, opacity, radius, blur_mode=BLUR_MODE, min_radius=BLUR_MIN_RADIUS)
+    return effects.shadow(no_bg, opacity, radius)
+
+
+#############################
+#     СЛОИ ТЕКСТА ВАРИАНТОВ
+#############################
+# Фон, плашки и надписи не зависят от пикселей товара: фон берётся из BG_CACHE, а всё, что
+# рисуется поверх товара, – из прозрачного слоя текста, который строится один раз на
+# (вариант, тексты, цветовую корзину) и хранится в LAYER_CACHE. На каждую карточку остаются
+# только тень, товар и одно наложение готового слоя (compose_card).
+
+def card_texts(texts=None):
+    """(title, subtitle, price) карточки: texts {"title", "subtitle", "price"} или TITLE_TEXT, SUBTITLE_TEXT, PRICE_TEXT."""
+    texts = texts or {}
+    return (texts.get("title", TITLE_TEXT), texts.get("subtitle", SUBTITLE_TEXT),
+            texts.get("price", PRICE_TEXT))
+
+def text_box_size(text, font, pad_x=20, pad_y=10, max_width=None):
+    """Размер (box_w, box_h), который займёт draw_text_with_box, без рисования."""
+    fit = fit_text(text, font, max_width, min_size=10, step=2)
+    return fit.width + pad_x*2, fit.height + pad_y*2
+
+def new_layer(width, height):
+    """Пустой прозрачный слой."""
+    return Image.new("RGBA", (width, height), (0, 0, 0, 0))
+
+def text_overlay(name, builder, *colors, texts=()):
+    """
+    Слой текста варианта: builder(FINAL_WIDTH, FINAL_HEIGHT, *colors, *texts), один на
+    (name, тексты, квантованные цвета). Возвращает (слой, обрезанный по содержимому, его позиция);
+    слой общий для всех карточек – его только накладывают.
+    """
+    colors = tuple(BG_CACHE.quantize(c) for c in colors)
+    texts = tuple(texts)
+
+    def build():
+        layer = builder(FINAL_WIDTH, FINAL_HEIGHT, *colors, *texts)
+        box = layer.getbbox() or (0, 0, 1, 1)
+        return layer.crop(box), box[:2]
+
+    return LAYER_CACHE.get_or_load((name, colors, texts, FINAL_WIDTH, FINAL_HEIGHT), build,
+                                   size_of=lambda entry: image_nbytes(entry[0]))
+
+def compose_card(bg, no_bg, position, shadow, shadow_position, overlay):
+    """Всё, что зависит от товара: тень и товар на фон, сверху – готовый слой текста (text_overlay)."""
+    bg.paste(shadow, shadow_position, shadow)
+    bg.paste(no_bg, position, no_bg)
+    layer, layer_position = overlay
+    bg.paste(layer, layer_position, layer)
+    return bg
+
+def draw_price(draw_obj, price, font, width, height, color, bottom_margin=30):
+    """Цена по центру снизу (на 120px выше нижнего отступа)."""
+    pr_bbox = draw_obj.textbbox((0,0), price, font=font)
+    pr_w = pr_bbox[2] - pr_bbox[0]
+    pr_h = pr_bbox[3] - pr_bbox[1]
+    price_x = (width - pr_w)//2
+    price_y = height - pr_h - bottom_margin - 120
+    draw_obj.text((price_x, price_y), price, fill=color, font=font)
+
+def variant_1_text(width, height, box_color, title, subtitle):
+    """Вариант 1: заголовок на плашке сверху, под ним подзаголовок (пустой – не рисуется)."""
+    layer = new_layer(width, height)
+    draw_obj = ImageDraw.Draw(layer)
+    x_center = width//2
+    cur_y = 20  # отступ сверху
+
+    # Title (с цветным прямоугольником)
+    box_w, box_h = draw_text_with_box(
+        draw_obj, title, x_center - 300, cur_y, load_font_bold(80),
+        box_color=box_color, text_color="white",
+        pad_x=40, pad_y=20, radius=30, max_width=600
+    )
+    cur_y += box_h + 10
+
+    # Subtitle
+    if subtitle:
+        draw_text_with_box(
+            draw_obj, subtitle, x_center - 250, cur_y, load_font_regular(50),
+            box_color=None, text_color="black", pad_x=0, pad_y=0,
+            max_width=500
+        )
+    return layer
+
+def variant_2_text(width, height, box_color, title, subtitle):
+    """Вариант 2: заголовок на плашке и подзаголовок сверху слева."""
+    layer = new_layer(width, height)
+    draw_obj = ImageDraw.Draw(layer)
+    left_margin = 50
+    cur_y = 50
+
+    # Title
+    bw, bh = draw_text_with_box(
+        draw_obj, title, left_margin, cur_y, load_font_bold(70),
+        box_color=box_color, text_color="white",
+        pad_x=30, pad_y=20, max_width=width - 2*left_margin
+    )
+    cur_y += bh + 20
+
+    # Subtitle
+    draw_text_with_box(
+        draw_obj, subtitle, left_margin, cur_y, load_font_regular(40),
+        box_color=None, text_color="black",
+        pad_x=0, pad_y=0, max_width=width - 2*left_margin
+    )
+    return layer
+
+def variant_3_text(width, height, box_color, title, subtitle, price):
+    """Вариант 3: заголовок на плашке и подзаголовок сверху, цена снизу."""
+    layer = new_layer(width, height)
+    draw_obj = ImageDraw.Draw(layer)
+    top_margin = 30
+    center_x   = width//2
+
+    # Title
+    bw, bh = draw_text_with_box(
+        draw_obj, title, center_x - 300, top_margin, load_font_bold(70),
+        box_color=box_color, text_color="white",
+        pad_x=40, pad_y=20, max_width=600
+    )
+    sub_y = top_margin + bh + 20
+    # Subtitle
+    draw_text_with_box(
+        draw_obj, subtitle, center_x - 250, sub_y, load_font_regular(40),
+        box_color=None, text_color="black", pad_x=0, pad_y=0,
+        max_width=500
+    )
+
+    # Снизу
+    draw_price(draw_obj, price, load_font_bold(50), width, height, "black")
+    return layer
+
+def variant_4_text(width, height, title, subtitle):
+    """Вариант 4: заголовок на белой плашке и подзаголовок сверху."""
+    layer = new_layer(width, height)
+    draw_obj = ImageDraw.Draw(layer)
+    cur_y = 30
+    center_x = width//2
+
+    # Title на белом прямоугольнике. Раньше плашка задавалась как (255,255,255,120),
+    # но на RGB-холсте альфа не учитывалась – плашка всегда была непрозрачной
+    tw, th = draw_text_with_box(
+        draw_obj, title, center_x - 300, cur_y, load_font_bold(80),
+        box_color=(255, 255, 255), text_color="black",
+        pad_x=30, pad_y=15, max_width=600
+    )
+    cur_y += th + 20
+
+    # Subtitle
+    draw_text_with_box(
+        draw_obj, subtitle, center_x - 250, cur_y, load_font_regular(50),
+        box_color=None, text_color="black",
+        pad_x=0, pad_y=0, max_width=500
+    )
+    return layer
+
+def variant_5_text(width, height, title, subtitle, price):
+    """Вариант 5: белые заголовок и подзаголовок сверху, цена снизу."""
+    layer = new_layer(width, height)
+    draw_obj = ImageDraw.Draw(layer)
+    top_margin = 30
+    x_center   = width//2
+
+    # Title
+    draw_text_with_box(
+        draw_obj, title,
+        x_center - 300, top_margin,
+        load_font_bold(80), box_color=None, text_color="white",
+        pad_x=20, pad_y=10, max_width=600
+    )
+    # Subtitle
+    draw_text_with_box(
+        draw_obj, subtitle,
+        x_center - 250, top_margin + 100,
+        load_font_regular(50), box_color=None, text_color="white",
+        pad_x=0, pad_y=0, max_width=500
+    )
+
+    # Снизу: Price
+    draw_price(draw_obj, price, load_font_bold(60), width, height, "white")
+    return layer
+
+def title_subtitle_text(width, height, title, subtitle, title_size, subtitle_size, title_color, subtitle_color):
+    """Варианты 6 и 7: заголовок сверху, подзаголовок внизу, без плашек."""
+    layer = new_layer(width, height)
+    draw_obj = ImageDraw.Draw(layer)
+
+    # Сверху: Title
+    title_x = (width - 600) // 2
+    title_y = 50
+    draw_text_with_box(
+        draw_obj, title, title_x, title_y, load_font_bold(title_size),
+        box_color=None, text_color=title_color, pad_x=0, pad_y=0,
+        max_width=600
+    )
+
+    # Снизу: Subtitle
+    subtitle_x = (width - 500) // 2
+    subtitle_y = height - 250
+    draw_text_with_box(
+        draw_obj, subtitle, subtitle_x, subtitle_y, load_font_regular(subtitle_size),
+        box_color=None, text_color=subtitle_color, pad_x=0, pad_y=0,
+        max_width=500
+    )
+    return layer
+
+def glass_panels_text(width, height, title, subtitle, title_alpha, subtitle_alpha, price_alpha=None):
+    """
+    Варианты 8-11: заголовок и подзаголовок на полупрозрачных белых панелях
+    (price_alpha – ещё пустая панель под цену внизу).
+    """
+    # Панели и надписи – на отдельных слоях: текст, нарисованный прямо по полупрозрачной
+    # панели прозрачного слоя, смешивается неверно; alpha_composite даёт то же, что рисование по фону
+    panels = new_layer(width, height)
+    panels_draw = ImageDraw.Draw(panels)
+    text = new_layer(width, height)
+    draw_obj = ImageDraw.Draw(text)
+
+    # Title
+    title_x = (width - 600) // 2
+    title_y = 50
+    panels_draw.rounded_rectangle(
+        [title_x - 20, title_y - 20, title_x + 600 + 20, title_y + 100],
+        fill=(255, 255, 255, title_alpha), radius=20
+    )
+    draw_text_with_box(
+        draw_obj, title, title_x, title_y, load_font_bold(70),
+        box_color=None, text_color="black", pad_x=0, pad_y=0,
+        max_width=600
+    )
+
+    # Subtitle
+    subtitle_x = (width - 500) // 2
+    subtitle_y = title_y + 120
+    panels_draw.rounded_rectangle(
+        [subtitle_x - 20, subtitle_y - 10, subtitle_x + 500 + 20, subtitle_y + 60],
+        fill=(255, 255, 255, subtitle_alpha), radius=15
+    )
+    draw_text_with_box(
+        draw_obj, subtitle, subtitle_x, subtitle_y, load_font_regular(40),
+        box_color=None, text_color="black", pad_x=0, pad_y=0,
+        max_width=500
+    )
+
+    # Price
+    if price_alpha is not None:
+        price_x = (width - 400) // 2
+        price_y = height - 200
+        panels_draw.rounded_rectangle(
+            [price_x - 20, price_y - 20, price_x + 400 + 20, price_y + 80],
+            fill=(255, 255, 255, price_alpha), radius=20
+        )
+    return Image.alpha_composite(panels, text)
+
 
 #############################
 #     5 ВАРИАНТОВ МАКЕТА
 #############################
 
-def variant_1(no_bg, avg_color):
+def variant_1(no_bg, avg_color, effects=None, colors=None, texts=None, seed=None):
     """
     Variant 1 (FIXED so text never goes beyond top area):
-      - Паттерн-фон
+      - Паттерн-фон (узор – акцентным цветом палитры товара)
       - Продукт в НИЖНЕЙ части (40-50% площади), по центру
       - Текст (Title, Subtitle, Price, Button) в верхней зоне
         без выхода за границы + авто-уменьшение шрифтов
     """
+    title, subtitle, _ = card_texts(texts)
+
     # 1) Создаём паттерн-фон
     base_col = lighten_color(avg_color, 0.3)
-    patt_col = darken_color(avg_color, 0.5)
-    bg = create_pattern_background(FINAL_WIDTH, FINAL_HEIGHT, base_col, patt_col)
+    patt_col = darken_color(accent_color(colors, avg_color), 0.5)
+    bg = BG_CACHE.get_or_create("pattern", create_pattern_background, FINAL_WIDTH, FINAL_HEIGHT, base_col, patt_col)
 
     # 2) Масштабируем продукт под 40-50%
     card_area = FINAL_WIDTH * FINAL_HEIGHT
@@ -295,58 +645,28 @@ def variant_1(no_bg, avg_color):
     product_y = FINAL_HEIGHT - h - 20
 
     # Тень
-    shadow = no_bg.convert("L").point(lambda p: p > 0 and 60).filter(ImageFilter.GaussianBlur(15))
-    bg.paste(shadow, (product_x+25, product_y+25), shadow)
-    bg.paste(no_bg, (product_x, product_y), no_bg)
+    shadow = shadow_layer(no_bg, 60, 15, effects)
 
-    # 3) Рисуем текст в зоне [0 .. product_y - 10]
-    draw_obj = ImageDraw.Draw(bg)
-    font_title    = load_font_bold(80)
-    font_subtitle = load_font_regular(50)
-    font_price    = load_font_bold(60)
+    # 3) Текст в зоне [0 .. product_y - 10]: если под заголовком уже нет места,
+    # подзаголовок не рисуем (реально лучше ещё уменьшать шрифт/товар, но это демо)
+    _, title_h = text_box_size(title, load_font_bold(80), pad_x=40, pad_y=20, max_width=600)
+    if 20 + title_h + 10 >= product_y - 10:
+        subtitle = ""
+    overlay = text_overlay("variant_1", variant_1_text, darken_color(avg_color, 0.4), texts=(title, subtitle))
+    return compose_card(bg, no_bg, (product_x, product_y), shadow, (product_x+25, product_y+25), overlay)
 
-    # Предельная нижняя граница текста
-    text_bottom_limit = product_y - 10
 
-    cur_y = 20  # отступ сверху
-    x_center = FINAL_WIDTH//2
-
-    # Title (с цветным прямоугольником)
-    box_w, box_h = draw_text_with_box(
-        draw_obj, TITLE_TEXT, x_center - 300, cur_y, font_title,
-        box_color=darken_color(avg_color,0.4), text_color="white",
-        pad_x=40, pad_y=20, radius=30, max_width=600
-    )
-    cur_y += box_h + 10
-    # Если уже вышли за пределы
-    if cur_y >= text_bottom_limit:
-        return bg  # Текст уже не влез; (реально лучше ещё уменьшать шрифт/товар, но это демо)
-
-    # Subtitle
-    sw, sh = draw_text_with_box(
-        draw_obj, SUBTITLE_TEXT, x_center - 250, cur_y, font_subtitle,
-        box_color=None, text_color="black", pad_x=0, pad_y=0,
-        max_width=500
-    )
-    cur_y += sh + 10
-    if cur_y >= text_bottom_limit:
-        return bg
-
-
-
-    return bg
-
-
-def variant_2(no_bg, avg_color):
+def variant_2(no_bg, avg_color, effects=None, colors=None, texts=None, seed=None):
     """
     Variant 2:
       - Радиальный градиент
       - Продукт в нижней части (40-50%)
       - Текст сверху слева
     """
+    title, subtitle, _ = card_texts(texts)
     center_col = darken_color(avg_color, 0.2)
     edge_col   = lighten_color(avg_color, 0.7)
-    bg = create_radial_gradient(FINAL_WIDTH, FINAL_HEIGHT, center_col, edge_col)
+    bg = BG_CACHE.get_or_create("radial", create_radial_gradient, FINAL_WIDTH, FINAL_HEIGHT, center_col, edge_col)
 
     # Масштаб в 40-50%
     card_area = FINAL_WIDTH * FINAL_HEIGHT
@@ -360,41 +680,14 @@ def variant_2(no_bg, avg_color):
     product_x = (FINAL_WIDTH - w)//2
     product_y = FINAL_HEIGHT - h - 100
 
-    shadow = no_bg.convert("L").point(lambda p: p>0 and 70).filter(ImageFilter.GaussianBlur(20))
-    bg.paste(shadow, (product_x+30, product_y+30), shadow)
-    bg.paste(no_bg, (product_x, product_y), no_bg)
+    shadow = shadow_layer(no_bg, 70, 20, effects)
 
     # Текст (сверху слева)
-    draw_obj = ImageDraw.Draw(bg)
-    font_title    = load_font_bold(70)
-    font_subtitle = load_font_regular(40)
-    font_price    = load_font_bold(50)
+    overlay = text_overlay("variant_2", variant_2_text, darken_color(avg_color, 0.5), texts=(title, subtitle))
+    return compose_card(bg, no_bg, (product_x, product_y), shadow, (product_x+30, product_y+30), overlay)
 
-    left_margin = 50
-    cur_y = 50
 
-    # Title
-    bw, bh = draw_text_with_box(
-        draw_obj, TITLE_TEXT, left_margin, cur_y, font_title,
-        box_color=darken_color(avg_color,0.5), text_color="white",
-        pad_x=30, pad_y=20, max_width=FINAL_WIDTH - 2*left_margin
-    )
-    cur_y += bh + 20
-
-    # Subtitle
-    sw, sh = draw_text_with_box(
-        draw_obj, SUBTITLE_TEXT, left_margin, cur_y, font_subtitle,
-        box_color=None, text_color="black",
-        pad_x=0, pad_y=0, max_width=FINAL_WIDTH - 2*left_margin
-    )
-    cur_y += sh + 20
-
-
-
-    return bg
-
-
-def variant_3(no_bg, avg_color):
+def variant_3(no_bg, avg_color, effects=None, colors=None, texts=None, seed=None):
     """
     Variant 3:
       - Линейный градиент (сверху вниз)
@@ -403,7 +696,7 @@ def variant_3(no_bg, avg_color):
     """
     top_col = darken_color(avg_color, 0.3)
     bot_col = lighten_color(avg_color, 0.5)
-    bg = create_linear_gradient(FINAL_WIDTH, FINAL_HEIGHT, top_col, bot_col)
+    bg = BG_CACHE.get_or_create("linear", create_linear_gradient, FINAL_WIDTH, FINAL_HEIGHT, top_col, bot_col)
 
     card_area = FINAL_WIDTH*FINAL_HEIGHT
     no_bg, _ = scale_product_to_area(
@@ -417,58 +710,25 @@ def variant_3(no_bg, avg_color):
     product_x = (FINAL_WIDTH - w)//2
     product_y = (FINAL_HEIGHT - h)//2
 
-    shadow = no_bg.convert("L").point(lambda p:p>0 and 80).filter(ImageFilter.GaussianBlur(25))
-    bg.paste(shadow, (product_x+35, product_y+35), shadow)
-    bg.paste(no_bg, (product_x, product_y), no_bg)
+    shadow = shadow_layer(no_bg, 80, 25, effects)
 
-    # Текст: сверху (Title, Subtitle), снизу (Price, Button)
-    draw_obj = ImageDraw.Draw(bg)
-    font_title    = load_font_bold(70)
-    font_subtitle = load_font_regular(40)
-    font_price    = load_font_bold(50)
+    # Текст: сверху (Title, Subtitle), снизу (Price)
+    overlay = text_overlay("variant_3", variant_3_text, darken_color(avg_color, 0.4), texts=card_texts(texts))
+    return compose_card(bg, no_bg, (product_x, product_y), shadow, (product_x+35, product_y+35), overlay)
 
-    # Сверху
-    top_margin = 30
-    center_x   = FINAL_WIDTH//2
-    # Title
-    bw, bh = draw_text_with_box(
-        draw_obj, TITLE_TEXT, center_x - 300, top_margin, font_title,
-        box_color=darken_color(avg_color,0.4), text_color="white",
-        pad_x=40, pad_y=20, max_width=600
-    )
-    sub_y = top_margin + bh + 20
-    # Subtitle
-    draw_text_with_box(
-        draw_obj, SUBTITLE_TEXT, center_x - 250, sub_y, font_subtitle,
-        box_color=None, text_color="black", pad_x=0, pad_y=0,
-        max_width=500
-    )
-
-    # Снизу
-    bottom_margin = 30
-    pr_bbox = draw_obj.textbbox((0,0), PRICE_TEXT, font=font_price)
-    pr_w = pr_bbox[2] - pr_bbox[0]
-    pr_h = pr_bbox[3] - pr_bbox[1]
-    price_x = (FINAL_WIDTH - pr_w)//2
-    price_y = FINAL_HEIGHT - pr_h - bottom_margin - 120
-    draw_obj.text((price_x, price_y), PRICE_TEXT, fill="black", font=font_price)
 
-    # Button
-
-
-    return bg
-
-
-def variant_4(no_bg, avg_color):
+def variant_4(no_bg, avg_color, effects=None, colors=None, texts=None, seed=None):
     """
-    Variant 4: 
+    Variant 4:
       - "Cloud" background
       - Продукт снизу
       - Текст в верхней/средней зоне, показывая другую логику
     """
+    title, subtitle, _ = card_texts(texts)
+
     # 1) Создаём "облачный" фон
     base_col = lighten_color(avg_color, 0.2)
-    bg = create_cloud_background(FINAL_WIDTH, FINAL_HEIGHT, base_col)
+    bg = create_cloud_background(FINAL_WIDTH, FINAL_HEIGHT, base_col, seed)
 
     # 2) Масштаб продукта
     card_area = FINAL_WIDTH * FINAL_HEIGHT
@@ -482,54 +742,24 @@ def variant_4(no_bg, avg_color):
     product_x = (FINAL_WIDTH - w)//2
     product_y = FINAL_HEIGHT - h - 60  # снизу
 
-    shadow = no_bg.convert("L").point(lambda p: p>0 and 100).filter(ImageFilter.GaussianBlur(20))
-    bg.paste(shadow, (product_x+25, product_y+25), shadow)
-    bg.paste(no_bg, (product_x, product_y), no_bg)
+    shadow = shadow_layer(no_bg, 100, 20, effects)
 
     # 3) Текст – сверху/по центру
-    draw_obj = ImageDraw.Draw(bg)
-    font_title    = load_font_bold(80)
-    font_subtitle = load_font_regular(50)
-    font_price    = load_font_bold(60)
+    overlay = text_overlay("variant_4", variant_4_text, texts=(title, subtitle))
+    return compose_card(bg, no_bg, (product_x, product_y), shadow, (product_x+25, product_y+25), overlay)
 
-    cur_y = 30
-    center_x = FINAL_WIDTH//2
 
-    # Title (белый полупрозрачный прямоугольник под ним)
-    box_col = (255,255,255,120)  # полупрозрачный
-    # Pillow не имеет built-in "rounded_rectangle" в RGBA заливке напрямую,
-    # сделаем проще – просто draw.rectangle:
-    # (или можно создать отдельный слой)
-    tw, th = draw_text_with_box(
-        draw_obj, TITLE_TEXT, center_x - 300, cur_y, font_title,
-        box_color=box_col, text_color="black",
-        pad_x=30, pad_y=15, max_width=600
-    )
-    cur_y += th + 20
-
-    # Subtitle
-    sw, sh = draw_text_with_box(
-        draw_obj, SUBTITLE_TEXT, center_x - 250, cur_y, font_subtitle,
-        box_color=None, text_color="black",
-        pad_x=0, pad_y=0, max_width=500
-    )
-    cur_y += sh + 30
-
-
-    return bg
-
-
-def variant_5(no_bg, avg_color):
+def variant_5(no_bg, avg_color, effects=None, colors=None, texts=None, seed=None):
     """
     Variant 5:
       - "Bokeh" background
       - Продукт по центру
-      - Текст вокруг (сверху и снизу), 
+      - Текст вокруг (сверху и снизу),
         но в более "минималистичном" стиле
     """
     # Создаём bokeh
     base_col = darken_color(avg_color, 0.1)
-    bg = create_bokeh_background(FINAL_WIDTH, FINAL_HEIGHT, base_col)
+    bg = create_bokeh_background(FINAL_WIDTH, FINAL_HEIGHT, base_col, seed)
 
     # Масштаб
     card_area = FINAL_WIDTH * FINAL_HEIGHT
@@ -543,65 +773,32 @@ def variant_5(no_bg, avg_color):
     product_x = (FINAL_WIDTH - w)//2
     product_y = (FINAL_HEIGHT - h)//2 + 40
 
-    shadow = no_bg.convert("L").point(lambda p:p>0 and 70).filter(ImageFilter.GaussianBlur(25))
-    bg.paste(shadow, (product_x+40, product_y+40), shadow)
-    bg.paste(no_bg, (product_x, product_y), no_bg)
-
-    # Текст
-    draw_obj = ImageDraw.Draw(bg)
-    font_title    = load_font_bold(80)
-    font_subtitle = load_font_regular(50)
-    font_price    = load_font_bold(60)
-
-    # Сверху: Title / Subtitle
-    top_margin = 30
-    x_center   = FINAL_WIDTH//2
-
-    # Title
-    draw_text_with_box(
-        draw_obj, TITLE_TEXT,
-        x_center - 300, top_margin,
-        font_title, box_color=None, text_color="white",
-        pad_x=20, pad_y=10, max_width=600
-    )
-    # Subtitle
-    draw_text_with_box(
-        draw_obj, SUBTITLE_TEXT,
-        x_center - 250, top_margin + 100,
-        font_subtitle, box_color=None, text_color="white",
-        pad_x=0, pad_y=0, max_width=500
-    )
-
-    # Снизу: Price / Button
-    bottom_margin = 30
-    pr_bbox = draw_obj.textbbox((0,0), PRICE_TEXT, font=font_price)
-    pr_w = pr_bbox[2] - pr_bbox[0]
-    pr_h = pr_bbox[3] - pr_bbox[1]
-    price_x = (FINAL_WIDTH - pr_w)//2
-    price_y = FINAL_HEIGHT - pr_h - bottom_margin - 120
-    draw_obj.text((price_x, price_y), PRICE_TEXT, fill="white", font=font_price)
-
+    shadow = shadow_layer(no_bg, 70, 25, effects)
 
-    return bg
+    # Текст: сверху Title / Subtitle, снизу Price
+    overlay = text_overlay("variant_5", variant_5_text, texts=card_texts(texts))
+    return compose_card(bg, no_bg, (product_x, product_y), shadow, (product_x+40, product_y+40), overlay)
 
 
-def variant_6(no_bg, avg_color):
+def variant_6(no_bg, avg_color, effects=None, colors=None, texts=None, seed=None):
     """
     Variant 6:
-      - Split background (two colors)
+      - Split background (two colors: средний и акцентный цвет товара)
       - Продукт по центру
       - Текст сверху и снизу в минималистичном стиле
     """
+    title, subtitle, _ = card_texts(texts)
+
     # 1) Создаём split background
     bg = Image.new("RGB", (FINAL_WIDTH, FINAL_HEIGHT), (255, 255, 255))
     draw = ImageDraw.Draw(bg)
-    
+
     # Верхняя часть фона
     top_bg_color = lighten_color(avg_color, 0.7)
     draw.rectangle([0, 0, FINAL_WIDTH, FINAL_HEIGHT // 2], fill=top_bg_color)
-    
+
     # Нижняя часть фона
-    bottom_bg_color = darken_color(avg_color, 0.3)
+    bottom_bg_color = darken_color(accent_color(colors, avg_color), 0.3)
     draw.rectangle([0, FINAL_HEIGHT // 2, FINAL_WIDTH, FINAL_HEIGHT], fill=bottom_bg_color)
 
     # 2) Масштабируем продукт
@@ -617,45 +814,21 @@ def variant_6(no_bg, avg_color):
     product_y = (FINAL_HEIGHT - h) // 2
 
     # Тень
-    shadow = no_bg.convert("L").point(lambda p: p > 0 and 70).filter(ImageFilter.GaussianBlur(20))
-    bg.paste(shadow, (product_x + 25, product_y + 25), shadow)
-    bg.paste(no_bg, (product_x, product_y), no_bg)
+    shadow = shadow_layer(no_bg, 70, 20, effects)
 
-    # 3) Текст
-    draw_obj = ImageDraw.Draw(bg)
-    font_title = load_font_bold(70)
-    font_subtitle = load_font_regular(40)
-    font_price = load_font_bold(50)
-
-    # Сверху: Title
-    title_x = (FINAL_WIDTH - 600) // 2
-    title_y = 50
-    draw_text_with_box(
-        draw_obj, TITLE_TEXT, title_x, title_y, font_title,
-        box_color=None, text_color="black", pad_x=0, pad_y=0,
-        max_width=600
-    )
-
-    # Снизу: Subtitle, Price, Button
-    bottom_margin = 50
-    subtitle_x = (FINAL_WIDTH - 500) // 2
-    subtitle_y = FINAL_HEIGHT - 250
-    draw_text_with_box(
-        draw_obj, SUBTITLE_TEXT, subtitle_x, subtitle_y, font_subtitle,
-        box_color=None, text_color="white", pad_x=0, pad_y=0,
-        max_width=500
-    )
+    # 3) Текст: сверху Title, снизу Subtitle
+    overlay = text_overlay("variant_6", title_subtitle_text, texts=(title, subtitle, 70, 40, "black", "white"))
+    return compose_card(bg, no_bg, (product_x, product_y), shadow, (product_x + 25, product_y + 25), overlay)
 
-
-    return bg
-
-def variant_7(no_bg, avg_color):
+def variant_7(no_bg, avg_color, effects=None, colors=None, texts=None, seed=None):
     """
     Variant 7:
       - Dark background with glow effect
       - Продукт по центру с glow эффектом
       - Текст сверху и снизу в современном стиле
     """
+    title, subtitle, _ = card_texts(texts)
+
     # 1) Создаём тёмный фон
     bg_color = darken_color(avg_color, 0.8)
     bg = Image.new("RGB", (FINAL_WIDTH, FINAL_HEIGHT), bg_color)
@@ -673,52 +846,27 @@ def variant_7(no_bg, avg_color):
     product_y = (FINAL_HEIGHT - h) // 2
 
     # Glow эффект
-    glow = no_bg.convert("L").point(lambda p: p > 0 and 100).filter(ImageFilter.GaussianBlur(30))
-    bg.paste(glow, (product_x - 50, product_y - 50), glow)
-    bg.paste(no_bg, (product_x, product_y), no_bg)
+    glow = shadow_layer(no_bg, 100, 30, effects)
 
-    # 3) Текст
-    draw_obj = ImageDraw.Draw(bg)
-    font_title = load_font_bold(80)
-    font_subtitle = load_font_regular(50)
-    font_price = load_font_bold(60)
+    # 3) Текст: сверху Title, снизу Subtitle
+    overlay = text_overlay("variant_7", title_subtitle_text, texts=(title, subtitle, 80, 50, "white", "white"))
+    return compose_card(bg, no_bg, (product_x, product_y), glow, (product_x - 50, product_y - 50), overlay)
 
-    # Сверху: Title
-    title_x = (FINAL_WIDTH - 600) // 2
-    title_y = 50
-    draw_text_with_box(
-        draw_obj, TITLE_TEXT, title_x, title_y, font_title,
-        box_color=None, text_color="white", pad_x=0, pad_y=0,
-        max_width=600
-    )
 
-    # Снизу: Subtitle, Price, Button
-    bottom_margin = 50
-    subtitle_x = (FINAL_WIDTH - 500) // 2
-    subtitle_y = FINAL_HEIGHT - 250
-    draw_text_with_box(
-        draw_obj, SUBTITLE_TEXT, subtitle_x, subtitle_y, font_subtitle,
-        box_color=None, text_color="white", pad_x=0, pad_y=0,
-        max_width=500
-    )
 
-
-
-    return bg
-
-
-
-def variant_8(no_bg, avg_color):
+def variant_8(no_bg, avg_color, effects=None, colors=None, texts=None, seed=None):
     """
     Variant 8:
       - Elegant gradient background
       - Продукт "парит" с тенью
       - Текст в минималистичном стиле с полупрозрачными блоками
     """
+    title, subtitle, _ = card_texts(texts)
+
     # 1) Создаём градиентный фон
     top_color = lighten_color(avg_color, 0.8)
     bottom_color = darken_color(avg_color, 0.2)
-    bg = create_linear_gradient(FINAL_WIDTH, FINAL_HEIGHT, top_color, bottom_color)
+    bg = BG_CACHE.get_or_create("linear", create_linear_gradient, FINAL_WIDTH, FINAL_HEIGHT, top_color, bottom_color)
 
     # 2) Масштабируем продукт
     card_area = FINAL_WIDTH * FINAL_HEIGHT
@@ -733,61 +881,25 @@ def variant_8(no_bg, avg_color):
     product_y = (FINAL_HEIGHT - h) // 2 - 50  # Смещаем вверх для "парящего" эффекта
 
     # Тень
-    shadow = no_bg.convert("L").point(lambda p: p > 0 and 80).filter(ImageFilter.GaussianBlur(30))
-    bg.paste(shadow, (product_x + 40, product_y + 60), shadow)
-    bg.paste(no_bg, (product_x, product_y), no_bg)
-
-    # 3) Текст
-    draw_obj = ImageDraw.Draw(bg, "RGBA")
-    font_title = load_font_bold(70)
-    font_subtitle = load_font_regular(40)
-    font_price = load_font_bold(50)
-
-    # Title (полупрозрачный блок)
-    title_bg_color = (255, 255, 255, 150)  # Полупрозрачный белый
-    title_x = (FINAL_WIDTH - 600) // 2
-    title_y = 50
-    draw_obj.rounded_rectangle(
-        [title_x - 20, title_y - 20, title_x + 600 + 20, title_y + 100],
-        fill=title_bg_color, radius=20
-    )
-    draw_text_with_box(
-        draw_obj, TITLE_TEXT, title_x, title_y, font_title,
-        box_color=None, text_color="black", pad_x=0, pad_y=0,
-        max_width=600
-    )
-
-    # Subtitle (полупрозрачный блок)
-    subtitle_bg_color = (255, 255, 255, 120)
-    subtitle_x = (FINAL_WIDTH - 500) // 2
-    subtitle_y = title_y + 120
-    draw_obj.rounded_rectangle(
-        [subtitle_x - 20, subtitle_y - 10, subtitle_x + 500 + 20, subtitle_y + 60],
-        fill=subtitle_bg_color, radius=15
-    )
-    draw_text_with_box(
-        draw_obj, SUBTITLE_TEXT, subtitle_x, subtitle_y, font_subtitle,
-        box_color=None, text_color="black", pad_x=0, pad_y=0,
-        max_width=500
-    )
+    shadow = shadow_layer(no_bg, 80, 30, effects)
 
+    # 3) Текст на полупрозрачных блоках (тот же слой, что у вариантов 10 и 11)
+    overlay = text_overlay("glass_panels", glass_panels_text, texts=(title, subtitle, 150, 120))
+    return compose_card(bg, no_bg, (product_x, product_y), shadow, (product_x + 40, product_y + 60), overlay)
 
 
-
-    return bg
-
-
-def variant_9(no_bg, avg_color):
+def variant_9(no_bg, avg_color, effects=None, colors=None, texts=None, seed=None):
     """
     Variant 9:
       - Glass morphism эффект
       - Размытый фон с полупрозрачными панелями
       - Продукт по центру с тенью
     """
+    title, subtitle, _ = card_texts(texts)
+
     # 1) Создаём размытый фон
     base_color = lighten_color(avg_color, 0.7)
-    bg = create_cloud_background(FINAL_WIDTH, FINAL_HEIGHT, base_color)
-    bg = bg.filter(ImageFilter.GaussianBlur(10))  # Размываем фон
+    bg = create_glass_background(FINAL_WIDTH, FINAL_HEIGHT, base_color, seed)
 
     # 2) Масштабируем продукт
     card_area = FINAL_WIDTH * FINAL_HEIGHT
@@ -802,88 +914,27 @@ def variant_9(no_bg, avg_color):
     product_y = (FINAL_HEIGHT - h) // 2
 
     # Тень
-    shadow = no_bg.convert("L").point(lambda p: p > 0 and 80).filter(ImageFilter.GaussianBlur(30))
-    bg.paste(shadow, (product_x + 40, product_y + 40), shadow)
-    bg.paste(no_bg, (product_x, product_y), no_bg)
-
-    # 3) Текст на полупрозрачных панелях
-    draw_obj = ImageDraw.Draw(bg, "RGBA")
-    font_title = load_font_bold(70)
-    font_subtitle = load_font_regular(40)
-    font_price = load_font_bold(50)
-
-    # Title (стеклянная панель)
-    title_bg_color = (255, 255, 255, 120)  # Полупрозрачный белый
-    title_x = (FINAL_WIDTH - 600) // 2
-    title_y = 50
-    draw_obj.rounded_rectangle(
-        [title_x - 20, title_y - 20, title_x + 600 + 20, title_y + 100],
-        fill=title_bg_color, radius=20
-    )
-    draw_text_with_box(
-        draw_obj, TITLE_TEXT, title_x, title_y, font_title,
-        box_color=None, text_color="black", pad_x=0, pad_y=0,
-        max_width=600
-    )
-
-    # Subtitle (стеклянная панель)
-    subtitle_bg_color = (255, 255, 255, 100)
-    subtitle_x = (FINAL_WIDTH - 500) // 2
-    subtitle_y = title_y + 120
-    draw_obj.rounded_rectangle(
-        [subtitle_x - 20, subtitle_y - 10, subtitle_x + 500 + 20, subtitle_y + 60],
-        fill=subtitle_bg_color, radius=15
-    )
-    draw_text_with_box(
-        draw_obj, SUBTITLE_TEXT, subtitle_x, subtitle_y, font_subtitle,
-        box_color=None, text_color="black", pad_x=0, pad_y=0,
-        max_width=500
-    )
+    shadow = shadow_layer(no_bg, 80, 30, effects)
 
-    # Price (стеклянная панель)
-    price_bg_color = (255, 255, 255, 150)
-    price_x = (FINAL_WIDTH - 400) // 2
-    price_y = FINAL_HEIGHT - 200
-    draw_obj.rounded_rectangle(
-        [price_x - 20, price_y - 20, price_x + 400 + 20, price_y + 80],
-        fill=price_bg_color, radius=20
-    )
+    # 3) Текст на полупрозрачных (стеклянных) панелях + панель под цену
+    overlay = text_overlay("glass_panels", glass_panels_text, texts=(title, subtitle, 120, 100, 150))
+    return compose_card(bg, no_bg, (product_x, product_y), shadow, (product_x + 40, product_y + 40), overlay)
 
 
 
-
-
-    return bg
-
-
-
-def variant_10(no_bg, avg_color):
+def variant_10(no_bg, avg_color, effects=None, colors=None, texts=None, seed=None):
     """
     Variant 10:
-      - Diagonal gradient (top-left to bottom-right)
+      - Diagonal gradient (top-left to bottom-right), к акцентному цвету товара
       - Soft glow around the product
       - Текст на полупрозрачных панелях
     """
+    title, subtitle, _ = card_texts(texts)
+
     # 1) Создаём диагональный градиент
     color1 = lighten_color(avg_color, 0.7)
-    color2 = darken_color(avg_color, 0.3)
-    bg = Image.new("RGB", (FINAL_WIDTH, FINAL_HEIGHT), color1)
-    draw = ImageDraw.Draw(bg)
-
-    # Рисуем диагональный градиент
-    for i in range(FINAL_WIDTH + FINAL_HEIGHT):
-        x = i
-        y = 0
-        if x > FINAL_WIDTH:
-            x = FINAL_WIDTH
-            y = i - FINAL_WIDTH
-        t = i / (FINAL_WIDTH + FINAL_HEIGHT)
-        grad_color = (
-            int(color1[0] * (1 - t) + color2[0] * t),
-            int(color1[1] * (1 - t) + color2[1] * t),
-            int(color1[2] * (1 - t) + color2[2] * t),
-        )
-        draw.line([(x, y), (x - FINAL_HEIGHT, y + FINAL_HEIGHT)], fill=grad_color, width=2)
+    color2 = darken_color(accent_color(colors, avg_color), 0.3)
+    bg = BG_CACHE.get_or_create("diagonal", create_diagonal_gradient, FINAL_WIDTH, FINAL_HEIGHT, color1, color2)
 
     # 2) Масштабируем продукт
     card_area = FINAL_WIDTH * FINAL_HEIGHT
@@ -898,84 +949,28 @@ def variant_10(no_bg, avg_color):
     product_y = (FINAL_HEIGHT - h) // 2
 
     # Тень и свечение
-    shadow = no_bg.convert("L").point(lambda p: p > 0 and 80).filter(ImageFilter.GaussianBlur(30))
-    bg.paste(shadow, (product_x + 40, product_y + 40), shadow)
-    bg.paste(no_bg, (product_x, product_y), no_bg)
+    shadow = shadow_layer(no_bg, 80, 30, effects)
 
     # 3) Текст на полупрозрачных панелях
-    draw_obj = ImageDraw.Draw(bg, "RGBA")
-    font_title = load_font_bold(70)
-    font_subtitle = load_font_regular(40)
-    font_price = load_font_bold(50)
-
-    # Title (полупрозрачный блок)
-    title_bg_color = (255, 255, 255, 150)  # Полупрозрачный белый
-    title_x = (FINAL_WIDTH - 600) // 2
-    title_y = 50
-    draw_obj.rounded_rectangle(
-        [title_x - 20, title_y - 20, title_x + 600 + 20, title_y + 100],
-        fill=title_bg_color, radius=20
-    )
-    draw_text_with_box(
-        draw_obj, TITLE_TEXT, title_x, title_y, font_title,
-        box_color=None, text_color="black", pad_x=0, pad_y=0,
-        max_width=600
-    )
+    overlay = text_overlay("glass_panels", glass_panels_text, texts=(title, subtitle, 150, 120))
+    return compose_card(bg, no_bg, (product_x, product_y), shadow, (product_x + 40, product_y + 40), overlay)
 
-    # Subtitle (полупрозрачный блок)
-    subtitle_bg_color = (255, 255, 255, 120)
-    subtitle_x = (FINAL_WIDTH - 500) // 2
-    subtitle_y = title_y + 120
-    draw_obj.rounded_rectangle(
-        [subtitle_x - 20, subtitle_y - 10, subtitle_x + 500 + 20, subtitle_y + 60],
-        fill=subtitle_bg_color, radius=15
-    )
-    draw_text_with_box(
-        draw_obj, SUBTITLE_TEXT, subtitle_x, subtitle_y, font_subtitle,
-        box_color=None, text_color="black", pad_x=0, pad_y=0,
-        max_width=500
-    )
-
-
-
-    return bg
 
 
-
-def variant_11(no_bg, avg_color):
+def variant_11(no_bg, avg_color, effects=None, colors=None, texts=None, seed=None):
     """
     Variant 11:
       - Diagonal gradient (top-left to bottom-right)
       - Subtle pattern overlay
       - Текст на полупрозрачных панелях
     """
-    # 1) Создаём диагональный градиент
+    title, subtitle, _ = card_texts(texts)
+
+    # 1-2) Диагональный градиент + subtle pattern
     color1 = lighten_color(avg_color, 0.8)
     color2 = darken_color(avg_color, 0.2)
-    bg = Image.new("RGB", (FINAL_WIDTH, FINAL_HEIGHT), color1)
-    draw = ImageDraw.Draw(bg)
-
-    # Рисуем диагональный градиент
-    for i in range(FINAL_WIDTH + FINAL_HEIGHT):
-        x = i
-        y = 0
-        if x > FINAL_WIDTH:
-            x = FINAL_WIDTH
-            y = i - FINAL_WIDTH
-        t = i / (FINAL_WIDTH + FINAL_HEIGHT)
-        grad_color = (
-            int(color1[0] * (1 - t) + color2[0] * t),
-            int(color1[1] * (1 - t) + color2[1] * t),
-            int(color1[2] * (1 - t) + color2[2] * t),
-        )
-        draw.line([(x, y), (x - FINAL_HEIGHT, y + FINAL_HEIGHT)], fill=grad_color, width=2)
-
-    # 2) Добавляем subtle pattern
-    pattern = Image.new("RGBA", (FINAL_WIDTH, FINAL_HEIGHT), (255, 255, 255, 0))
-    pattern_draw = ImageDraw.Draw(pattern)
-    for i in range(0, FINAL_WIDTH + FINAL_HEIGHT, 20):
-        pattern_draw.line([(i, 0), (0, i)], fill=(255, 255, 255, 10), width=2)
-    bg = Image.alpha_composite(bg.convert("RGBA"), pattern).convert("RGB")
+    bg = BG_CACHE.get_or_create("diagonal_pattern", create_diagonal_pattern_background,
+                                FINAL_WIDTH, FINAL_HEIGHT, color1, color2)
 
     # 3) Масштабируем продукт
     card_area = FINAL_WIDTH * FINAL_HEIGHT
@@ -990,54 +985,220 @@ def variant_11(no_bg, avg_color):
     product_y = (FINAL_HEIGHT - h) // 2
 
     # Тень
-    shadow = no_bg.convert("L").point(lambda p: p > 0 and 80).filter(ImageFilter.GaussianBlur(30))
-    bg.paste(shadow, (product_x + 40, product_y + 40), shadow)
-    bg.paste(no_bg, (product_x, product_y), no_bg)
+    shadow = shadow_layer(no_bg, 80, 30, effects)
 
     # 4) Текст на полупрозрачных панелях
-    draw_obj = ImageDraw.Draw(bg, "RGBA")
-    font_title = load_font_bold(70)
-    font_subtitle = load_font_regular(40)
-    font_price = load_font_bold(50)
-
-    # Title (полупрозрачный блок)
-    title_bg_color = (255, 255, 255, 150)  # Полупрозрачный белый
-    title_x = (FINAL_WIDTH - 600) // 2
-    title_y = 50
-    draw_obj.rounded_rectangle(
-        [title_x - 20, title_y - 20, title_x + 600 + 20, title_y + 100],
-        fill=title_bg_color, radius=20
-    )
-    draw_text_with_box(
-        draw_obj, TITLE_TEXT, title_x, title_y, font_title,
-        box_color=None, text_color="black", pad_x=0, pad_y=0,
-        max_width=600
-    )
+    overlay = text_overlay("glass_panels", glass_panels_text, texts=(title, subtitle, 150, 120))
+    return compose_card(bg, no_bg, (product_x, product_y), shadow, (product_x + 40, product_y + 40), overlay)
 
-    # Subtitle (полупрозрачный блок)
-    subtitle_bg_color = (255, 255, 255, 120)
-    subtitle_x = (FINAL_WIDTH - 500) // 2
-    subtitle_y = title_y + 120
-    draw_obj.rounded_rectangle(
-        [subtitle_x - 20, subtitle_y - 10, subtitle_x + 500 + 20, subtitle_y + 60],
-        fill=subtitle_bg_color, radius=15
-    )
-    draw_text_with_box(
-        draw_obj, SUBTITLE_TEXT, subtitle_x, subtitle_y, font_subtitle,
-        box_color=None, text_color="black", pad_x=0, pad_y=0,
-        max_width=500
-    )
-
-    return bg
 
 
+VARIANTS = [variant_1, variant_2, variant_3, variant_4, variant_5, variant_6, variant_7, variant_8,
+            variant_9, variant_10, variant_11]
 
 #############################
 #          MAIN
 #############################
 
+def render_template_variant(plan, no_bg, avg_color, effects=None, colors=None, texts=None, seed=None):
+    """Карточка из скомпилированного макета (templates.RenderPlan) с сигнатурой обычного варианта."""
+    title, subtitle, price = card_texts(texts)
+    return plan.render(no_bg, {"title": title, "subtitle": subtitle, "price": price})
+
+def render_variants(variants, no_bg, avg_color, result_dir, base_name,
+                    executor=VARIANT_EXECUTOR, workers=VARIANT_WORKERS, encoder=None, colors=None,
+                    texts=None, seeds=None):
+    """
+    Рисует варианты параллельно (executor: "thread", "process" или None – по очереди).
+    no_bg – подготовленный товар (prepare_product): варианты получают одно и то же изображение
+    без копий и только читают его. Тени и свечение товара считаются один раз на товар
+    и общие для всех вариантов (в режиме "process" у каждой задачи своя копия кэша).
+    colors – ColorStats товара (палитра, яркость); варианты получают её без повторного подсчёта.
+    texts – {"title", "subtitle", "price"} товара (по умолчанию TITLE_TEXT, SUBTITLE_TEXT, PRICE_TEXT).
+    Готовые карточки кодируются (encoder, по умолчанию OUTPUT_FORMAT и VARIANT_FORMATS)
+    и сохраняются в фоновых потоках, пока рисуются остальные.
+    Имена файлов не зависят от порядка завершения; упавший вариант не останавливает остальные.
+    variants – список функций (номера с 1) или {номер/имя: функция} (select_layouts).
+    seeds – {номер варианта: зерно случайного фона} (card_seed); без него фоны случайные.
+    Возвращает {номер варианта: путь} для успешно сохранённых.
+    """
+    saved = {}
+    items = list(variants.items()) if isinstance(variants, dict) else list(enumerate(variants, 1))
+    seeds = seeds or {}
+    effects = ProductEffects(BLUR_MODE, BLUR_MIN_RADIUS)
+    if encoder is None:
+        encoder = Encoder(OUTPUT_FORMAT, PNG_COMPRESS_LEVEL, OUTPUT_QUALITY)
+    pool_cls = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}.get(executor)
+    with ImageWriter(encoder, workers=SAVE_WORKERS) as writer:
+        save_futures = {}
+
+        def save(i, card_img):
+            base_path = os.path.join(result_dir, f"{base_name}_variant_{i}")
+            fmt = VARIANT_FORMATS.get(i)
+            save_futures[writer.submit(card_img, base_path, encoder.with_format(fmt) if fmt else None)] = i
+
+        if pool_cls is None:
+            for i, v_func in items:
+                print(f"Генерируем вариант #{i}...")
+                try:
+                    save(i, v_func(no_bg, avg_color, effects, colors, texts, seeds.get(i)))
+                except Exception as e:
+                    print(f"❌ Вариант #{i} не удался: {e}")
+        else:
+            with pool_cls(max_workers=workers or os.cpu_count()) as pool:
+                futures = {pool.submit(v_func, no_bg, avg_color, effects, colors, texts, seeds.get(i)): i
+                           for i, v_func in items}
+                for fut in as_completed(futures):
+                    i = futures[fut]
+                    try:
+                        save(i, fut.result())
+                        print(f"Вариант #{i} готов")
+                    except Exception as e:
+                        print(f"❌ Вариант #{i} не удался: {e}")
+
+        for fut in as_completed(save_futures):
+            i = save_futures[fut]
+            try:
+                saved[i] = fut.result()
+                print(f" → Сохранено: {saved[i]}")
+            except Exception as e:
+                print(f"❌ Не удалось сохранить вариант #{i}: {e}")
+    return {i: saved[i] for i, _ in items if i in saved}
+
+def select_layouts(layouts=None):
+    """
+    {ключ: функция} макетов для рендера. layouts – номера вариантов (1-11) и названия дизайнов
+    из TEMPLATE_FILE; None – все варианты и TEMPLATE_DESIGNS. Ключ – номер варианта
+    или "дизайн_карточка" (он же – часть имени файла).
+    """
+    if layouts is None:
+        layouts = list(range(1, len(VARIANTS) + 1)) + list(TEMPLATE_DESIGNS)
+    selected = {}
+    for layout in layouts:
+        if isinstance(layout, str) and layout.isdigit():
+            layout = int(layout)
+        if isinstance(layout, int) and not isinstance(layout, bool):
+            if not 1 <= layout <= len(VARIANTS):
+                raise ValueError(f"Нет варианта #{layout} (есть 1-{len(VARIANTS)})")
+            selected[layout] = VARIANTS[layout - 1]
+        elif isinstance(layout, str):
+            for plan in load_templates(TEMPLATE_FILE).plans(layout):
+                selected[f"{plan.design}_{plan.card}"] = partial(render_template_variant, plan)
+        else:
+            raise ValueError(f"Макет должен быть номером варианта или названием дизайна, а не {layout!r}")
+    return selected
+
+def open_cutout_cache():
+    if not CUTOUT_CACHE_DIR:
+        return None
+    return CutoutCache(CUTOUT_CACHE_DIR, store=CUTOUT_CACHE_STORE, max_bytes=CUTOUT_CACHE_MAX_MB * 1024**2)
+
+def layout_version(v_func):
+    """Версия макета: код функции варианта или, для макета из файла дизайнов, код рендера и версия карточки."""
+    if isinstance(v_func, partial):
+        return code_fingerprint(v_func.func, RenderPlan) + v_func.args[0].version
+    return code_fingerprint(v_func)
+
+def card_seed(image_hash, key):
+    """Зерно случайного фона карточки: из SEED, содержимого фото и ключа варианта (None без SEED)."""
+    return None if SEED is None else derive_seed(SEED, image_hash, str(key))
+
+def card_fingerprints(image_hash, variants, texts=None):
+    """{ключ варианта: отпечаток входов его карточки} (см. INCREMENTAL)."""
+    inputs = {
+        "image": image_hash,
+        "texts": card_texts(texts),
+        "segmentation": [SEG_MODEL, SEG_PROXY_SIZE, SEG_MAX_SIZE],
+        "product": [PRODUCT_AREA_RATIO_MAX, TRIM_PRODUCT, BLUR_MODE, BLUR_MIN_RADIUS],
+        # code_fingerprint не видит настроек внутри объектов: цвета фонов и слоёв квантует BG_CACHE
+        "colors": BG_COLOR_STEP,
+        "output": [OUTPUT_FORMAT, PNG_COMPRESS_LEVEL, OUTPUT_QUALITY],
+        "seed": SEED,
+    }
+    return {key: digest({**inputs, "layout": layout_version(v_func), "format": VARIANT_FORMATS.get(key)})
+            for key, v_func in variants.items()}
+
+# Сколько карточек перерисовано и сколько пропущено без изменений (за весь запуск)
+REBUILD_STATS = {"rendered": 0, "skipped": 0}
+
+def process_product(input_path, result_dir, base_name, variants, texts=None, cutout_cache=None):
+    """
+    Все шаги для одного фото: вырезка, цвета, подготовка товара и варианты ({ключ: функция}).
+    С INCREMENTAL рисуются только карточки с изменившимися входами. Возвращает {ключ: путь}.
+    """
+    store = fingerprints = None
+    unchanged = {}
+    image_hash = file_hash(input_path)
+    if INCREMENTAL:
+        store = FingerprintStore(result_dir)
+        fingerprints = card_fingerprints(image_hash, variants, texts)
+        unchanged = {key: store.output(f"variant_{key}") for key in variants
+                     if store.is_current(f"variant_{key}", fingerprints[key])}
+        REBUILD_STATS["skipped"] += len(unchanged)
+        if unchanged:
+            print(f"Без изменений, пропущено карточек: {len(unchanged)} из {len(variants)}")
+        if len(unchanged) == len(variants):
+            return unchanged
+        variants = {key: v_func for key, v_func in variants.items() if key not in unchanged}
+
+    # 1) Удаляем фон (повторные запуски на тех же фото берут результат из кэша)
+    no_bg = remove_background(input_path, cache=cutout_cache, model_name=SEG_MODEL,
+                              intra_op_threads=SEG_INTRA_THREADS, inter_op_threads=SEG_INTER_THREADS,
+                              proxy_size=SEG_PROXY_SIZE, max_size=SEG_MAX_SIZE)
+    no_bg_path = os.path.join(result_dir, f"{base_name}_no_bg.png")
+    no_bg.save(no_bg_path)
+    print(f"Сохранён файл без фона: {no_bg_path}")
+
+    # 2) Средний цвет и палитра (по выборке пикселей – время не зависит от размера фото)
+    colors = color_stats(no_bg)
+    avg_color = colors.average
+    print(f"Средний цвет товара: {avg_color}, палитра: {[c for c, _ in colors.palette]}")
+
+    # 3) Готовим товар один раз: уменьшаем до самого большого размера в вариантах
+    card_area = FINAL_WIDTH * FINAL_HEIGHT
+    product = prepare_product(no_bg, int(card_area * PRODUCT_AREA_RATIO_MAX), trim=TRIM_PRODUCT)
+
+    # 4) Генерируем все варианты (параллельно, сохранение – в фоне)
+    seeds = {key: card_seed(image_hash, key) for key in variants}
+    saved = render_variants(variants, product.image, avg_color, result_dir, base_name, colors=colors, texts=texts,
+                            seeds=seeds)
+    REBUILD_STATS["rendered"] += len(saved)
+    if store is not None:
+        for key, path in saved.items():
+            store.record(f"variant_{key}", fingerprints[key], path)
+        store.save()
+    return {**unchanged, **saved}
+
+def render_catalog_record(record, cutout_cache=None):
+    """
+    Карточки одного товара каталога (catalog.CatalogRecord) в OUTPUT_FOLDER/<record.name>.
+    Если хоть один макет не сохранился – ошибка: товар попадёт в итоги как "failed".
+    """
+    variants = select_layouts(record.layouts)
+    if not os.path.isfile(record.image):
+        raise FileNotFoundError(f"нет файла {record.image}")
+    result_dir = os.path.join(OUTPUT_FOLDER, record.name)
+    os.makedirs(result_dir, exist_ok=True)
+    print(f"Обрабатываем: {record.key} ({record.image})")
+    saved = process_product(record.image, result_dir, record.name, variants, record.texts, cutout_cache)
+    missing = [key for key in variants if key not in saved]
+    if missing:
+        raise RuntimeError(f"не сохранены макеты {missing}")
+    return {str(key): path for key, path in saved.items()}
+
 def main():
     os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+    cutout_cache = open_cutout_cache()
+
+    if CATALOG_FILE:
+        summary = run_catalog(CATALOG_FILE, CATALOG_RESULTS, partial(render_catalog_record, cutout_cache=cutout_cache),
+                              retry_failed=CATALOG_RETRY_FAILED)
+        print(f"Кэш фонов: {BG_CACHE.stats()}, слоёв текста: {LAYER_CACHE.stats()}")
+        print(f"✅ Каталог: готово {summary.ok}, с ошибками {summary.failed}, "
+              f"пропущено (уже готовы) {summary.skipped}; итоги – {CATALOG_RESULTS}")
+        print(f"Карточек перерисовано: {REBUILD_STATS['rendered']}, без изменений: {REBUILD_STATS['skipped']}")
+        return
+
     files = sorted(f for f in os.listdir(INPUT_FOLDER) if os.path.isfile(os.path.join(INPUT_FOLDER, f)))
     if not files:
         print("❌ Нет файлов в папке 'inputs'!")
@@ -1050,32 +1211,9 @@ def main():
     os.makedirs(result_dir, exist_ok=True)
 
     print(f"Обрабатываем: {selected_file}")
+    process_product(input_path, result_dir, base_name, select_layouts(), cutout_cache=cutout_cache)
 
-    # 1) Удаляем фон
-    original = Image.open(input_path).convert("RGBA")
-    no_bg = remove(original)
-    no_bg_path = os.path.join(result_dir, f"{base_name}_no_bg.png")
-    no_bg.save(no_bg_path)
-    print(f"Сохранён файл без фона: {no_bg_path}")
-
-    # 2) Средний цвет
-    arr = np.array(no_bg)
-    mask = arr[:,:,3] > 0
-    if np.any(mask):
-        avg_color = tuple(arr[:,:,:3][mask].mean(axis=0).astype(int))
-    else:
-        avg_color = (128,128,128)
-    print(f"Средний цвет товара: {avg_color}")
-
-    # 3) Генерируем 5 разных вариантов
-    variants = [variant_1, variant_2, variant_3, variant_4, variant_5,variant_6,variant_7,variant_8,variant_9,variant_10,variant_11]
-    for i, v_func in enumerate(variants, 1):
-        print(f"Генерируем вариант #{i}...")
-        card_img = v_func(no_bg.copy(), avg_color)
-        out_path = os.path.join(result_dir, f"{base_name}_variant_{i}.png")
-        card_img.save(out_path)
-        print(f" → Сохранено: {out_path}")
-
+    print(f"Кэш фонов: {BG_CACHE.stats()}, слоёв текста: {LAYER_CACHE.stats()}")
     print("✅ Все 9 вариантов готовы!")
 
 if __name__ == "__main__":
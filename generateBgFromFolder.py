@@ -1,16 +1,31 @@
+import time
+_IMPORT_START = time.perf_counter()
+
 import os
-import math
 import random
 import json
 import logging
-from typing import List, Tuple, Dict, Optional
-import numpy as np
-import torch
-import torchvision
-import torchvision.transforms as T
-from torchvision.models import ResNet50_Weights
+import threading
+import glob
+import hashlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import Iterator, List, Set, Tuple, Dict, Optional, Union
+# torch, torchvision and numpy are imported on first use to keep CLI startup fast
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
-from rembg import remove
+from classification_cache import ClassificationCache, file_hash
+from asset_cache import AssetCache, image_nbytes
+from cutout_cache import CutoutCache, STORE_MODES
+from effects import ProductEffects, make_shadow
+from product import PreparedProduct, prepare_product
+from encoders import Encoder, ImageWriter, FORMATS
+from color_stats import color_stats
+from fingerprint import FingerprintStore, code_fingerprint, derive_seed, digest, folder_digest
+from templates import RenderPlan, TemplateError, TEMPLATE_FILE, load_templates
+from segmentation import (remove_background, remove_background_bytes, load_image, proxy_edge_accuracy,
+                          SEGMENTATION_MODELS)
+from pipeline import Stage, StageError, run_pipeline
+from text_layout import get_font, fit_text, text_layer
 import argparse
 import colorsys
 
@@ -23,22 +38,53 @@ CONFIG_FILE = "product_config.json"
 BG_FOLDER = "bg"
 BG_TITLE_FOLDER = "bg_title"
 BOTTOM_MARGIN = 3  # Tiny bottom margin
+CUTOUT_CACHE_DIR = ".cutout_cache"
+CLASSIFICATION_CACHE_DB = ".classification_cache.sqlite"
+SEG_PROXY_CHECKS_FILE = ".seg_proxy_checks.json"  # measured proxy edge accuracies, by image and options
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+PIPELINE_STAGES = ("decode", "segment", "classify", "render", "encode")
+ASSET_CACHE_MB = 128  # decoded, pre-resized backgrounds and title backgrounds kept in memory
 
 # Logging setup
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+IMPORT_TIME = time.perf_counter() - _IMPORT_START
+
+CLASSIFIER_BACKENDS = ("fp32", "int8", "onnx")
+ONNX_MODEL_PATH = os.path.join("models", "resnet50.onnx")
+
+
+class OnnxModel:
+    """Runs an exported ResNet-50 graph with onnxruntime behind the same call interface as the torch model."""
+    def __init__(self, onnx_path: str, intra_op_threads: Optional[int] = None):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        if intra_op_threads:
+            opts.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(onnx_path, opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x: "torch.Tensor") -> "torch.Tensor":
+        import torch
+        return torch.from_numpy(self.session.run(None, {self.input_name: x.numpy()})[0])
+
+
 class ProductClassifier:
-    """Handles image classification using ResNet-50."""
-    def __init__(self, labels_file: str = "imagenet_classes.txt"):
-        self.model = torchvision.models.resnet50(weights=ResNet50_Weights.IMAGENET1K_V1)
-        self.model.eval()
-        self.transform = T.Compose([
-            T.Resize(256),
-            T.CenterCrop(224),
-            T.ToTensor(),
-            T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-        ])
+    """
+    Handles image classification using ResNet-50. The model is loaded on first use.
+    backend: "fp32" (torch), "int8" (quantized torch) or "onnx" (exported graph on onnxruntime).
+    """
+    def __init__(self, labels_file: str = "imagenet_classes.txt", backend: str = "fp32",
+                 onnx_path: str = ONNX_MODEL_PATH):
+        if backend not in CLASSIFIER_BACKENDS:
+            raise ValueError(f"backend must be one of {CLASSIFIER_BACKENDS}, got {backend!r}")
+        self.backend = backend
+        self.onnx_path = onnx_path
+        self.model_id = "resnet50-imagenet1k-v1" if backend == "fp32" else f"resnet50-imagenet1k-v1-{backend}"
+        self._model = None
+        self._transform = None
+        self._load_lock = threading.Lock()
         try:
             with open(labels_file, "r") as f:
                 self.labels = [s.strip() for s in f.readlines()]
@@ -46,19 +92,135 @@ class ProductClassifier:
             logger.error(f"{labels_file} not found. Please download it.")
             raise SystemExit
 
+    @staticmethod
+    def _fp32_model():
+        import torchvision
+        from torchvision.models import ResNet50_Weights
+        model = torchvision.models.resnet50(weights=ResNet50_Weights.IMAGENET1K_V1)
+        model.eval()
+        return model
+
+    def _int8_model(self):
+        import torch
+        engines = torch.backends.quantized.supported_engines
+        engine = next((e for e in ("x86", "fbgemm") if e in engines), None)
+        if engine is not None:
+            # Fully int8 (conv + fc) model with pre-calibrated weights
+            from torchvision.models.quantization import resnet50, ResNet50_QuantizedWeights
+            torch.backends.quantized.engine = engine
+            model = resnet50(weights=ResNet50_QuantizedWeights.IMAGENET1K_FBGEMM_V1, quantize=True)
+            model.eval()
+            return model
+        # No fbgemm kernels (e.g. ARM): only the fc layer can be quantized dynamically
+        logger.warning("fbgemm quantized engine not available, using dynamic int8 quantization of the fc layer")
+        return torch.ao.quantization.quantize_dynamic(self._fp32_model(), {torch.nn.Linear}, dtype=torch.qint8)
+
+    def _onnx_model(self) -> OnnxModel:
+        if not os.path.exists(self.onnx_path):
+            import torch
+            logger.info(f"Exporting ResNet-50 to {self.onnx_path}")
+            os.makedirs(os.path.dirname(self.onnx_path) or ".", exist_ok=True)
+            torch.onnx.export(self._fp32_model(), torch.zeros(1, 3, 224, 224), self.onnx_path,
+                              input_names=["input"], output_names=["logits"],
+                              dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}})
+        return OnnxModel(self.onnx_path)
+
+    def _load(self) -> None:
+        with self._load_lock:
+            if self._model is not None:
+                return
+            start = time.perf_counter()
+            import torchvision.transforms as T
+
+            self._transform = T.Compose([
+                T.Resize(256),
+                T.CenterCrop(224),
+                T.ToTensor(),
+                T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+            ])
+            if self.backend == "int8":
+                self._model = self._int8_model()
+            elif self.backend == "onnx":
+                self._model = self._onnx_model()
+            else:
+                self._model = self._fp32_model()
+            logger.info(f"Classifier ({self.backend}) loaded in {time.perf_counter() - start:.2f}s")
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._load()
+        return self._model
+
+    @property
+    def transform(self):
+        if self._transform is None:
+            self._load()
+        return self._transform
+
+    def _load_tensor(self, img_path: str) -> "torch.Tensor":
+        return self.transform(Image.open(img_path).convert("RGB"))
+
+    def _top5(self, probs: "torch.Tensor") -> List[Tuple[str, float]]:
+        top5_vals, top5_idxs = probs.topk(5)
+        return [(self.labels[idx.item()], val.item()) for val, idx in zip(top5_vals, top5_idxs)]
+
     def classify(self, img_path: str) -> List[Tuple[str, float]]:
         try:
-            img = Image.open(img_path).convert("RGB")
-            x = self.transform(img).unsqueeze(0)
-            with torch.no_grad():
-                logits = self.model(x)
-                probs = torch.nn.functional.softmax(logits, dim=1)[0]
-            top5_vals, top5_idxs = probs.topk(5)
-            return [(self.labels[idx.item()], val.item()) for val, idx in zip(top5_vals, top5_idxs)]
+            return self.classify_image(Image.open(img_path))
         except Exception as e:
             logger.error(f"Failed to classify {img_path}: {e}")
             return []
 
+    def classify_image(self, img: Image.Image) -> List[Tuple[str, float]]:
+        """Top-5 labels for an already decoded image."""
+        import torch
+        x = self.transform(img.convert("RGB")).unsqueeze(0)
+        with torch.inference_mode():
+            logits = self.model(x)
+            probs = torch.nn.functional.softmax(logits, dim=1)[0]
+        return self._top5(probs)
+
+    def classify_batch(self, img_paths: List[str], batch_size: int = 16,
+                       workers: int = 4) -> List[List[Tuple[str, float]]]:
+        """
+        Classifies many images, returning one top-5 list per path (empty on failure).
+        Images are decoded and preprocessed on a thread pool while the previous batch
+        runs through the model; a failing image or batch does not affect the others.
+        """
+        import torch
+
+        def load(path: str) -> Optional["torch.Tensor"]:
+            try:
+                return self._load_tensor(path)
+            except Exception as e:
+                logger.error(f"Failed to classify {path}: {e}")
+                return None
+
+        results: List[List[Tuple[str, float]]] = [[] for _ in img_paths]
+        chunks = [list(range(i, min(i + batch_size, len(img_paths)))) for i in range(0, len(img_paths), batch_size)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = [pool.submit(load, img_paths[i]) for i in chunks[0]] if chunks else []
+            for n, chunk in enumerate(chunks):
+                tensors = [f.result() for f in pending]
+                # Prefetch the next batch while this one is inferred
+                pending = [pool.submit(load, img_paths[i]) for i in chunks[n + 1]] if n + 1 < len(chunks) else []
+
+                ok = [(i, t) for i, t in zip(chunk, tensors) if t is not None]
+                if not ok:
+                    continue
+                try:
+                    with torch.inference_mode():
+                        logits = self.model(torch.stack([t for _, t in ok]))
+                        probs = torch.nn.functional.softmax(logits, dim=1)
+                    for (i, _), p in zip(ok, probs):
+                        results[i] = self._top5(p)
+                except Exception as e:
+                    logger.error(f"Batch inference failed ({e}), falling back to per-image classification")
+                    for i, _ in ok:
+                        results[i] = self.classify(img_paths[i])
+        return results
+
     def map_to_product_type(self, top5: List[Tuple[str, float]], file_name: Optional[str] = None) -> str:
         labels = [lbl.lower() for lbl, _ in top5]
         dog_bowl_syns = ["bowl", "dish", "mixing bowl", "crock pot", "soup bowl", "plate"]
@@ -74,83 +236,115 @@ class ProductClassifier:
             return "MUG"
         return "UNKNOWN"
 
-def trim_transparent(img: Image.Image) -> Image.Image:
-    """Trims transparent areas from an image, returning the cropped result."""
-    # Convert to RGBA if not already
-    if img.mode != "RGBA":
-        img = img.convert("RGBA")
-    
-    # Get the alpha channel
-    alpha = img.split()[3]
-    # Find the bounding box of non-transparent pixels
-    bbox = alpha.getbbox()
-    if bbox:
-        # Crop to the non-transparent area
-        return img.crop(bbox)
-    else:
-        # If no non-transparent pixels, return the original (shouldn't happen post-rembg)
-        logger.warning("No non-transparent pixels found in image after trimming.")
-        return img
+def content_hashes(img_paths: List[str]) -> List[Optional[str]]:
+    """Content hash of each file (None, logged, for files that can't be read)."""
+    hashes: List[Optional[str]] = []
+    for path in img_paths:
+        try:
+            hashes.append(file_hash(path))
+        except OSError as e:
+            logger.error(f"Failed to read {path}: {e}")
+            hashes.append(None)
+    return hashes
+
+def classify_files(classifier: ProductClassifier, img_paths: List[str], cache: Optional[ClassificationCache] = None,
+                   batch_size: int = 16, workers: int = 4,
+                   hashes: Optional[List[Optional[str]]] = None) -> List[Tuple[List[Tuple[str, float]], str]]:
+    """
+    Returns (top5, product_type) for each path. The product type is mapped from the labels only
+    (no file-name hints) so it can be cached by image content; only cache misses reach the CNN.
+    Pass hashes (content_hashes) if the caller already has them, so files aren't read twice.
+    """
+    results: List[Optional[Tuple[List[Tuple[str, float]], str]]] = [None] * len(img_paths)
+    if hashes is None:
+        hashes = content_hashes(img_paths) if cache is not None else [None] * len(img_paths)
+    if cache is not None:
+        for i, content_hash in enumerate(hashes):
+            if content_hash is not None:
+                results[i] = cache.get(content_hash, classifier.model_id)
+
+    todo = [i for i, r in enumerate(results) if r is None]
+    for i, top5 in zip(todo, classifier.classify_batch([img_paths[i] for i in todo], batch_size, workers)):
+        product_type = classifier.map_to_product_type(top5)
+        results[i] = (top5, product_type)
+        if cache is not None and top5 and hashes[i]:
+            cache.put(hashes[i], classifier.model_id, top5, product_type)
+    return results
 
 class CardRenderer:
-    """Renders product cards with pre-loaded backgrounds and title BGs."""
-    def __init__(self, bg_folder: str = BG_FOLDER, bg_title_folder: str = BG_TITLE_FOLDER):
-        try:
-            self.fonts = {
-                "title": ImageFont.truetype("arialbd.ttf", 100),
-                "subtitle": ImageFont.truetype("Arial.ttf", 50),
-            }
-        except:
-            logger.warning("Arial fonts not found, using defaults.")
-            self.fonts = {
-                "title": ImageFont.load_default(size=100),
-                "subtitle": ImageFont.load_default(size=50),
-            }
+    """
+    Renders product cards with pre-loaded backgrounds and title BGs.
+    Decoded, already-resized backgrounds and title backgrounds (with their color statistics)
+    are kept in an AssetCache (shareable between renderers).
+    plans are compiled template cards (templates.py) rendered for every product after the variants.
+    Random choices (background, title backgrounds, product scale) come from the rng passed to render(),
+    so a seeded rng gives the same card every time.
+    """
+    def __init__(self, bg_folder: str = BG_FOLDER, bg_title_folder: str = BG_TITLE_FOLDER,
+                 assets: Optional[AssetCache] = None, plans: Optional[List[RenderPlan]] = None):
+        self.assets = assets if assets is not None else AssetCache(ASSET_CACHE_MB * 1024**2)
+        self.plans = plans or []
+        self.fonts = {
+            "title": get_font("bold", 100),
+            "subtitle": get_font("regular", 50),
+        }
         
         # Load card backgrounds
-        self.bg_files = [f for f in os.listdir(bg_folder) if os.path.isfile(os.path.join(bg_folder, f)) and f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+        self.bg_files = sorted(f for f in os.listdir(bg_folder) if os.path.isfile(os.path.join(bg_folder, f)) and f.lower().endswith(('.png', '.jpg', '.jpeg')))
         if not self.bg_files:
             logger.error(f"No backgrounds found in {bg_folder}")
             raise SystemExit
         self.bg_folder = bg_folder
 
         # Load title backgrounds
-        self.bg_title_files = [f for f in os.listdir(bg_title_folder) if os.path.isfile(os.path.join(bg_title_folder, f)) and f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+        self.bg_title_files = sorted(f for f in os.listdir(bg_title_folder) if os.path.isfile(os.path.join(bg_title_folder, f)) and f.lower().endswith(('.png', '.jpg', '.jpeg')))
         if not self.bg_title_files:
             logger.error(f"No title backgrounds found in {bg_title_folder}")
             raise SystemExit
         self.bg_title_folder = bg_title_folder
 
+    def load_random_background(self, rng: Optional[random.Random] = None) -> Image.Image:
+        """Loads a random card background (chosen with rng, default: the global random state)."""
+        bg_file = (rng or random).choice(self.bg_files)
+        bg_path = os.path.join(self.bg_folder, bg_file)
+
+        def load() -> Image.Image:
+            bg = Image.open(bg_path).convert("RGBA")
+            return bg.resize((FINAL_WIDTH, FINAL_HEIGHT), Image.LANCZOS)
+
+        # render() draws on the background, so hand out a copy of the cached one
+        return self.assets.get_or_load(("bg", bg_path, FINAL_WIDTH, FINAL_HEIGHT), load).copy()
+
+    def pick_title_bg(self, rng: Optional[random.Random] = None) -> str:
+        """Path of a random title background (chosen with rng, default: the global random state)."""
+        return os.path.join(self.bg_title_folder, (rng or random).choice(self.bg_title_files))
+
+    def load_title_bg(self, bg_path: str, width: int, height: int) -> Tuple[Image.Image, Tuple[int, int, int], int]:
+        """
+        Loads a title background resized to width x height, with its average color and brightness.
+        All three are cached per (file, width, height); the returned image is shared and must not be modified.
+        """
+        def load() -> Tuple[Image.Image, Tuple[int, int, int], int]:
+            bg = Image.open(bg_path).convert("RGBA")
+            bg = bg.resize((width, height), Image.LANCZOS)
+            stats = color_stats(bg)
+            return bg, stats.average, stats.brightness
+
+        return self.assets.get_or_load(("title_bg", bg_path, width, height), load,
+                                       size_of=lambda entry: image_nbytes(entry[0]))
+
     @staticmethod
-    def brightness(color: Tuple[int, int, int]) -> int:
-        return sum(color) // 3
+    def ink_layer(mask: Image.Image) -> Image.Image:
+        """White layer with mask's alpha: what ImageDraw.bitmap(xy, mask) draws with the default ink."""
+        layer = Image.new("RGBA", mask.size, (255, 255, 255, 0))
+        layer.putalpha(mask.getchannel("A"))
+        return layer
 
-    def load_random_background(self) -> Image.Image:
-        """Loads a random card background."""
-        bg_file = random.choice(self.bg_files)
-        bg_path = os.path.join(self.bg_folder, bg_file)
-        bg = Image.open(bg_path).convert("RGBA")
-        return bg.resize((FINAL_WIDTH, FINAL_HEIGHT), Image.LANCZOS)
-
-    def load_random_title_bg(self, width: int, height: int) -> Tuple[Image.Image, Tuple[int, int, int]]:
-        """Loads a random title background and calculates its average color."""
-        bg_file = random.choice(self.bg_title_files)
-        bg_path = os.path.join(self.bg_title_folder, bg_file)
-        bg = Image.open(bg_path).convert("RGBA")
-        bg = bg.resize((width, height), Image.LANCZOS)
-        arr = np.array(bg)
-        avg_color = tuple(arr[:, :, :3][arr[:, :, 3] > 0].mean(axis=0).astype(int)) if np.any(arr[:, :, 3] > 0) else (128, 128, 128)
-        return bg, avg_color
-
-    def draw_text_with_bg(self, draw: ImageDraw.Draw, text: str, font: ImageFont.FreeTypeFont, y: int, 
-                          max_width: Optional[int]) -> Tuple[int, int]:
-        """Draws centered text on a pre-loaded title background."""
-        bbox = draw.textbbox((0, 0), text, font=font)
-        tw, th = bbox[2] - bbox[0], bbox[3] - bbox[1]
-        while max_width and tw > max_width - 100 and font.size > 20:
-            font = font.font_variant(size=font.size - 5)
-            bbox = draw.textbbox((0, 0), text, font=font)
-            tw, th = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    def draw_text_with_bg(self, overlay: Image.Image, text: str, font: ImageFont.FreeTypeFont, y: int,
+                          max_width: Optional[int], title_bg_path: str) -> Tuple[int, int]:
+        """Composites centered text on a title background (with its shadow) into the transparent overlay."""
+        fit = fit_text(text, font, max_width - 100 if max_width else None, min_size=20, step=5)
+        font, tw, th = fit.font, fit.width, fit.height
 
         bg_width = min(tw + 80, FINAL_WIDTH - 40)
         bg_height = th + 40
@@ -159,54 +353,109 @@ class CardRenderer:
         tx = (FINAL_WIDTH - tw) // 2
         ty = y
 
-        title_bg, bg_avg_color = self.load_random_title_bg(bg_width, bg_height)
-        text_color = (255, 255, 255) if self.brightness(bg_avg_color) < 128 else (0, 0, 0)
+        title_bg, _, bg_brightness = self.load_title_bg(title_bg_path, bg_width, bg_height)
+        text_color = (255, 255, 255) if bg_brightness < 128 else (0, 0, 0)
 
         shadow = Image.new("RGBA", (bg_width + 20, bg_height + 20), (0, 0, 0, 0))
         s_draw = ImageDraw.Draw(shadow)
         s_draw.rectangle((10, 10, bg_width + 10, bg_height + 10), fill=(0, 0, 0, 120))
         shadow = shadow.filter(ImageFilter.GaussianBlur(8))
-        draw.bitmap((bg_x0 - 10, bg_y0 - 10), shadow)
+        overlay.alpha_composite(self.ink_layer(shadow), (bg_x0 - 10, bg_y0 - 10))
+        overlay.alpha_composite(self.ink_layer(title_bg), (bg_x0, bg_y0))
 
-        draw.bitmap((bg_x0, bg_y0), title_bg)
-        draw.text((tx + 5, ty + 5), text, fill=(0, 0, 0, 160), font=font)
-        draw.text((tx, ty), text, fill=text_color, font=font)
+        # Each layer is composited on its own: drawing over half-transparent overlay pixels would blend wrongly
+        for (x0, y0), fill in (((tx + 5, ty + 5), (0, 0, 0, 160)), ((tx, ty), text_color)):
+            layer, (dx, dy) = text_layer(text, font, fill)
+            overlay.alpha_composite(layer, (x0 + dx, y0 + dy))
 
         return tw, th
 
-    def render(self, no_bg: Image.Image, avg_color: Tuple[int, int, int], title: str, subtitle: str, variant: int) -> Image.Image:
-        """Renders a product card with product at the very bottom."""
-        bg = self.load_random_background()
+    def text_overlay(self, title: str, subtitle: str, title_bgs: Tuple[str, str]) -> Tuple[Image.Image, Tuple[int, int]]:
+        """
+        Title and subtitle panels of a card: everything that doesn't depend on the product, precomposed on a
+        transparent layer and cached per (texts, title backgrounds). Returns the layer cropped to its content
+        and its position on the card; the layer is shared and must not be modified.
+        """
+        def build() -> Tuple[Image.Image, Tuple[int, int]]:
+            overlay = Image.new("RGBA", (FINAL_WIDTH, FINAL_HEIGHT), (0, 0, 0, 0))
+            y = 100
+            tw, th = self.draw_text_with_bg(overlay, title, self.fonts["title"], y, FINAL_WIDTH, title_bgs[0])
+            y += th + 60
+            self.draw_text_with_bg(overlay, subtitle, self.fonts["subtitle"], y, FINAL_WIDTH, title_bgs[1])
+            box = overlay.getbbox() or (0, 0, 1, 1)
+            return overlay.crop(box), box[:2]
+
+        return self.assets.get_or_load(("text_overlay", title, subtitle, title_bgs, FINAL_WIDTH, FINAL_HEIGHT),
+                                       build, size_of=lambda entry: image_nbytes(entry[0]))
+
+    @staticmethod
+    def prepare(no_bg: Image.Image) -> PreparedProduct:
+        """Trims the cut-out once and downscales it to the largest product size a card uses."""
+        return prepare_product(no_bg, MAX_PRODUCT_AREA_RATIO * FINAL_WIDTH * FINAL_HEIGHT)
+
+    def render(self, product: Union[PreparedProduct, Image.Image], avg_color: Tuple[int, int, int], title: str,
+               subtitle: str, variant: int, effects: Optional[ProductEffects] = None,
+               rng: Optional[random.Random] = None) -> Image.Image:
+        """
+        Renders a product card with product at the very bottom.
+        Pass the product as prepare(no_bg) and one ProductEffects to share the trimmed, downscaled
+        cut-out and its shadow layer between variants; the product is only read, never modified.
+        rng makes the card's random choices (default: the global random state).
+        """
+        rng = rng or random
+        bg = self.load_random_background(rng)
 
-        # Trim transparent areas
-        no_bg = trim_transparent(no_bg)
+        if not isinstance(product, PreparedProduct):
+            product = self.prepare(product)
 
-        # Scale product
+        # Scale product (from the trimmed size, so the prepared downscale doesn't change the layout)
         area = FINAL_WIDTH * FINAL_HEIGHT
-        target_area = random.uniform(MIN_PRODUCT_AREA_RATIO, MAX_PRODUCT_AREA_RATIO) * area
-        w, h = no_bg.size
-        scale = math.sqrt(target_area / (w * h))
-        no_bg = no_bg.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
+        target_area = rng.uniform(MIN_PRODUCT_AREA_RATIO, MAX_PRODUCT_AREA_RATIO) * area
+        no_bg = product.scaled(target_area)
 
         # Place product at bottom center with 3px margin
         px = (FINAL_WIDTH - no_bg.width) // 2
         py = FINAL_HEIGHT - no_bg.height - BOTTOM_MARGIN  # 3px from bottom
 
         # Crisp shadow
-        shadow = no_bg.convert("L").point(lambda p: 140 if p > 0 else 0).filter(ImageFilter.GaussianBlur(25))
+        shadow = effects.shadow(no_bg, 140, 25) if effects is not None else make_shadow(no_bg, 140, 25)
         bg.paste(shadow, (px + 30, py + 30), shadow)
         bg.paste(no_bg, (px, py), no_bg)
 
-        draw = ImageDraw.Draw(bg)
-        y = 100
-
-        # Draw title and subtitle
-        tw, th = self.draw_text_with_bg(draw, title, self.fonts["title"], y, FINAL_WIDTH)
-        y += th + 60
-        sw, sh = self.draw_text_with_bg(draw, subtitle, self.fonts["subtitle"], y, FINAL_WIDTH)
+        # Title and subtitle: one composite of the precomposed panels
+        overlay, position = self.text_overlay(title, subtitle, (self.pick_title_bg(rng), self.pick_title_bg(rng)))
+        bg.alpha_composite(overlay, position)
 
         return bg
 
+    def render_product(self, no_bg: Image.Image, title: str, subtitle: str, variants: int,
+                       label: str = "", only: Optional[Set[str]] = None,
+                       seed: Optional[int] = None) -> Iterator[Tuple[str, Image.Image]]:
+        """
+        Prepares one cut-out once and yields (file name without extension, card) for each variant and
+        each template card, or only for the cards named in only. Failed cards are logged and skipped.
+        seed (product_seed) seeds each variant's own rng: the same seed gives the same cards.
+        """
+        avg_color = color_stats(no_bg).average
+        product = self.prepare(no_bg)
+        effects = ProductEffects()
+        for i in range(variants):
+            if only is not None and f"variant_{i + 1}" not in only:
+                continue
+            rng = random.Random(derive_seed(seed, i + 1)) if seed is not None else None
+            try:
+                yield f"variant_{i + 1}", self.render(product, avg_color, title, subtitle, i, effects, rng)
+            except Exception as e:
+                logger.error(f"Error generating variant {i + 1} for {label}: {e}")
+        texts = {"title": title, "subtitle": subtitle}
+        for plan in self.plans:
+            if only is not None and f"{plan.design}_{plan.card}" not in only:
+                continue
+            try:
+                yield f"{plan.design}_{plan.card}", plan.render(product.image, texts)
+            except Exception as e:
+                logger.error(f"Error rendering template {plan.name} for {label}: {e}")
+
 def load_config(config_file: str) -> Dict:
     default_config = {
         "DOG_BOWL": {"titles": ["DOG BOWL (RED)", "Perfect Dog Bowl"], "subtitles": ["Non-slip design"]},
@@ -220,17 +469,596 @@ def load_config(config_file: str) -> Dict:
         logger.warning(f"{config_file} not found, using default config.")
         return default_config
 
+def load_sidecar_text(img_path: str) -> Optional[Tuple[str, str]]:
+    """Reads title/subtitle from a side-car JSON next to the image (photo.jpg -> photo.json), if present."""
+    sidecar = os.path.splitext(img_path)[0] + ".json"
+    if not os.path.isfile(sidecar):
+        return None
+    try:
+        with open(sidecar, "r") as f:
+            data = json.load(f)
+        return data.get("title") or "My Product", data.get("subtitle") or "No Info"
+    except (OSError, ValueError, AttributeError) as e:
+        logger.warning(f"Ignoring unreadable side-car {sidecar}: {e}")
+        return None
+
+def pick_text(product_type: str, config: Dict, img_path: str, interactive: bool = True,
+              unknown_title: Optional[str] = None, unknown_subtitle: Optional[str] = None,
+              rng: Optional[random.Random] = None) -> Tuple[str, str]:
+    """
+    Chooses title and subtitle for a product; UNKNOWN products ask the user or use side-car/config fallbacks.
+    Config texts are drawn with rng (default: the global random state).
+    """
+    rng = rng or random
+    if product_type != "UNKNOWN":
+        cfg = config.get(product_type, config["UNKNOWN"])
+        title = rng.choice(cfg["titles"])
+        subtitle = rng.choice(cfg["subtitles"])
+        logger.info(f"Using config text: Title='{title}', Subtitle='{subtitle}'")
+        return title, subtitle
+
+    if interactive:
+        while True:
+            ans = input("Product not recognized. Enter custom text? (y/n): ").strip().lower()
+            if ans in ["y", "n"]:
+                break
+            logger.info("Please enter 'y' or 'n'.")
+        if ans == "y":
+            title = input("Title (e.g., 'Dog Bowl'): ").strip() or "My Product"
+            subtitle = input("Subtitle (e.g., 'Non-slip design'): ").strip() or "No Info"
+            logger.info(f"Using custom text: Title='{title}', Subtitle='{subtitle}'")
+            return title, subtitle
+    else:
+        sidecar = load_sidecar_text(img_path)
+        if sidecar:
+            logger.info(f"Using side-car text: Title='{sidecar[0]}', Subtitle='{sidecar[1]}'")
+            return sidecar
+        if unknown_title or unknown_subtitle:
+            cfg = config["UNKNOWN"]
+            title = unknown_title or rng.choice(cfg["titles"])
+            subtitle = unknown_subtitle or rng.choice(cfg["subtitles"])
+            logger.info(f"Using fallback text: Title='{title}', Subtitle='{subtitle}'")
+            return title, subtitle
+
+    cfg = config["UNKNOWN"]
+    title = rng.choice(cfg["titles"])
+    subtitle = rng.choice(cfg["subtitles"])
+    logger.info(f"Using default text: Title='{title}', Subtitle='{subtitle}'")
+    return title, subtitle
+
+def product_seed(seed: Optional[int], image_hash: str) -> Optional[int]:
+    """Seed of one product's random choices: from the run's seed and the image content (None: unseeded)."""
+    return None if seed is None else derive_seed(seed, image_hash)
+
+def text_rng(seed: Optional[int]) -> Optional[random.Random]:
+    """rng for pick_text from a product_seed, independent of the variants' rngs."""
+    return random.Random(derive_seed(seed, "text")) if seed is not None else None
+
+def text_inputs(product_type: str, config: Dict, img_path: str, unknown_title: Optional[str] = None,
+                unknown_subtitle: Optional[str] = None) -> Dict:
+    """
+    What non-interactive pick_text chooses a product's texts from: the product type and its config entry,
+    plus the side-car and fallback texts for UNKNOWN products. Fingerprints use these rather than the
+    chosen texts, which are drawn at random from the config lists on every run.
+    """
+    inputs = {"product_type": product_type, "config": config.get(product_type, config["UNKNOWN"])}
+    if product_type == "UNKNOWN":
+        inputs.update(sidecar=load_sidecar_text(img_path), fallback=[unknown_title, unknown_subtitle])
+    return inputs
+
+def seg_key_opts(seg_opts: Dict) -> Dict:
+    """Segmentation options that change the cut-out (thread counts don't)."""
+    return {k: v for k, v in seg_opts.items() if not k.endswith("_threads")}
+
+def fingerprint_context(args, seg_opts: Dict) -> Dict:
+    """
+    Inputs shared by every card of a run: background assets, segmentation and encoder settings, seed.
+    seg_opts are the options after check_seg_proxy: whether the proxy is kept depends on the largest
+    input of the run, so adding or removing one image can change how every other card is segmented.
+    """
+    return {
+        "bg": folder_digest(BG_FOLDER, IMAGE_EXTENSIONS),
+        "bg_title": folder_digest(BG_TITLE_FOLDER, IMAGE_EXTENSIONS),
+        "segmentation": seg_key_opts(seg_opts),
+        "output": [args.format, args.png_compress, args.quality],
+        "seed": args.seed,
+    }
+
+def card_fingerprints(image_hash: str, texts: Dict, variants: int, plans: Optional[List[RenderPlan]],
+                      context: Dict) -> Dict[str, str]:
+    """
+    {card name: fingerprint} for one product: a digest of the image content, its text inputs, the run's
+    context and the card's layout version (the renderer's code, or a template card's spec and code).
+    """
+    layouts = {f"variant_{i + 1}": [code_fingerprint(CardRenderer), i] for i in range(variants)}
+    for plan in plans or []:
+        layouts[f"{plan.design}_{plan.card}"] = [code_fingerprint(RenderPlan), plan.version]
+    return {name: digest([image_hash, texts, context, layout]) for name, layout in layouts.items()}
+
+def stale_cards(out_dir: str, fingerprints: Dict[str, str]) -> Dict[str, str]:
+    """The entries of fingerprints whose card in out_dir is missing or was rendered from other inputs."""
+    store = FingerprintStore(out_dir)
+    return {name: fp for name, fp in fingerprints.items() if not store.is_current(name, fp)}
+
+def render_cards(img_path: str, title: str, subtitle: str, out_dir: str, renderer: CardRenderer, variants: int,
+                 cutout_cache: Optional[CutoutCache] = None, seg_opts: Optional[Dict] = None,
+                 writer: Optional[ImageWriter] = None, fingerprints: Optional[Dict[str, str]] = None,
+                 seed: Optional[int] = None) -> List[str]:
+    """
+    Removes the background of one photo and renders its card variants; the writer encodes and saves
+    them in the background while later variants render. Returns the saved paths.
+    With fingerprints ({card name: fingerprint}) only those cards are rendered, and their fingerprints
+    are recorded in out_dir for the next incremental run. seed is the product_seed of the cards.
+    """
+    no_bg = remove_background(img_path, cache=cutout_cache, **(seg_opts or {}))
+
+    os.makedirs(out_dir, exist_ok=True)
+    own_writer = writer is None
+    if own_writer:
+        writer = ImageWriter()
+    futures = []
+    store = FingerprintStore(out_dir) if fingerprints is not None else None
+    only = set(fingerprints) if fingerprints is not None else None
+    try:
+        for name, img in renderer.render_product(no_bg, title, subtitle, variants, os.path.basename(img_path),
+                                                 only, seed):
+            futures.append((name, writer.submit(img, os.path.join(out_dir, name))))
+        saved = []
+        for name, future in futures:
+            try:
+                saved.append(future.result())
+                logger.info(f"Saved: {saved[-1]}")
+            except Exception as e:
+                logger.error(f"Error saving {name} for {os.path.basename(img_path)}: {e}")
+                continue
+            if store is not None:
+                store.record(name, fingerprints[name], saved[-1])
+    finally:
+        if own_writer:
+            writer.close()
+    if store is not None:
+        store.save()
+    return saved
+
+# Per-process state of batch workers, set up once by _init_batch_worker
+_worker_state: Dict = {}
+
+def _init_batch_worker(cutout_opts: Optional[Dict], seg_opts: Dict, asset_cache_mb: int = ASSET_CACHE_MB,
+                       encoder: Optional[Encoder] = None, writer_threads: int = 2,
+                       design: Optional[Tuple[str, str]] = None) -> None:
+    plans = load_templates(design[0]).plans(design[1]) if design else None
+    _worker_state["renderer"] = CardRenderer(BG_FOLDER, BG_TITLE_FOLDER, AssetCache(asset_cache_mb * 1024**2), plans)
+    _worker_state["cutout_cache"] = CutoutCache(**cutout_opts) if cutout_opts else None
+    _worker_state["seg_opts"] = seg_opts
+    _worker_state["writer"] = ImageWriter(encoder, writer_threads)
+
+def _batch_job(job: Tuple[str, str, str, str, int, Dict[str, str], Optional[int]]) -> Tuple[str, int, Optional[str]]:
+    img_path, title, subtitle, out_dir, variants, fingerprints, seed = job
+    try:
+        saved = render_cards(img_path, title, subtitle, out_dir, _worker_state["renderer"], variants,
+                             _worker_state["cutout_cache"], _worker_state["seg_opts"], _worker_state["writer"],
+                             fingerprints, seed)
+        return img_path, len(saved), None
+    except Exception as e:
+        return img_path, 0, str(e)
+
+_first_card_logged = False
+
+def log_first_card() -> None:
+    """Logs import time and time to the first saved card (once per run, in every mode)."""
+    global _first_card_logged
+    if not _first_card_logged:
+        _first_card_logged = True
+        logger.info(f"Startup: imports {IMPORT_TIME:.2f}s, "
+                    f"time to first card {time.perf_counter() - _IMPORT_START:.2f}s")
+
+def output_encoder(args) -> Encoder:
+    return Encoder(args.format, compress_level=args.png_compress, quality=args.quality)
+
+def template_design(args) -> Optional[Tuple[str, str]]:
+    """(design file, design name) selected with --design, or None."""
+    return (args.templates, args.design) if args.design else None
+
+def template_plans(args) -> Optional[List[RenderPlan]]:
+    design = template_design(args)
+    return load_templates(design[0]).plans(design[1]) if design else None
+
+def check_seg_proxy(img_paths: List[str], seg_opts: Dict, min_accuracy: float,
+                    checks_file: Optional[str] = SEG_PROXY_CHECKS_FILE) -> Dict:
+    """
+    Segments the largest of img_paths with and without the proxy and returns the segmentation options
+    to use: seg_opts as given, or without the proxy if its edge accuracy is below min_accuracy
+    (0 skips the check). The measured accuracy is kept in checks_file per (image content, options),
+    so later runs on the same inputs don't segment anything for the check.
+    """
+    if not seg_opts.get("proxy_size") or min_accuracy <= 0 or not img_paths:
+        return seg_opts
+    img_path = max(img_paths, key=os.path.getsize)
+    full_opts = {k: v for k, v in seg_opts.items() if k != "proxy_size"}
+    with open(img_path, "rb") as f:
+        data = f.read()
+    key = digest([hashlib.sha256(data).hexdigest(), seg_key_opts(seg_opts)])
+    checks: Dict[str, float] = {}
+    if checks_file:
+        try:
+            with open(checks_file, encoding="utf-8") as f:
+                checks = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable {checks_file}: {e}")
+    accuracy = checks.get(key)
+    if accuracy is None:
+        accuracy = proxy_edge_accuracy(data, seg_opts["proxy_size"], **full_opts)
+        if checks_file:
+            checks[key] = accuracy
+            tmp_path = f"{checks_file}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(checks, f)
+            os.replace(tmp_path, checks_file)
+    if accuracy < min_accuracy:
+        logger.warning(f"Proxy segmentation edge accuracy {accuracy:.3f} < {min_accuracy} on "
+                       f"{os.path.basename(img_path)}, segmenting at full resolution")
+        return full_opts
+    logger.info(f"Proxy segmentation edge accuracy on {os.path.basename(img_path)}: {accuracy:.3f}")
+    return seg_opts
+
+def list_batch_inputs(input_folder: str, pattern: Optional[str]) -> List[str]:
+    """Image paths for batch mode: everything matching pattern (glob), or every image in input_folder."""
+    if pattern:
+        paths = glob.glob(pattern, recursive=True)
+    else:
+        paths = [os.path.join(input_folder, f) for f in os.listdir(input_folder)]
+    return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(IMAGE_EXTENSIONS))
+
+def output_dirs(output: str, img_paths: List[str]) -> Dict[str, str]:
+    """
+    Output folder of each input image: its path relative to the inputs' common folder, without the
+    extension (a/IMG.jpg -> <output>/a/IMG), so images from different folders never share one.
+    Images that differ only by extension keep it as a suffix (IMG.jpg, IMG.png -> IMG_jpg, IMG_png).
+    """
+    if not img_paths:
+        return {}
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in img_paths])
+    stems = {p: os.path.splitext(os.path.relpath(os.path.abspath(p), root))[0] for p in img_paths}
+    counts: Dict[str, int] = {}
+    for stem in stems.values():
+        counts[stem.lower()] = counts.get(stem.lower(), 0) + 1
+    return {p: os.path.join(output, stem if counts[stem.lower()] == 1 else f"{stem}_{os.path.splitext(p)[1][1:]}")
+            for p, stem in stems.items()}
+
+def run_batch(args, classifier: ProductClassifier, config: Dict, cutout_opts: Optional[Dict], seg_opts: Dict) -> None:
+    """
+    Non-interactive mode: classifies all inputs, then renders them on a process pool.
+    Cards whose fingerprint is unchanged since the last run are skipped (unless --full-rebuild),
+    and so are images with no card left to render.
+    """
+    paths = list_batch_inputs(args.input, args.glob)
+    if not paths:
+        logger.error(f"No images found in {args.glob or args.input}")
+        return
+    seg_opts = check_seg_proxy(paths, seg_opts, args.seg_proxy_min_accuracy)
+    context = fingerprint_context(args, seg_opts)
+    plans = template_plans(args)
+
+    class_cache = ClassificationCache(args.class_cache) if args.class_cache else None
+    hashes = content_hashes(paths)
+    classified = classify_files(classifier, paths, class_cache, batch_size=args.batch_size, workers=args.decode_workers,
+                                hashes=hashes)
+    out_dirs = output_dirs(args.output, paths)
+    jobs = []
+    unchanged = 0
+    for img_path, image_hash, (top5, product_type) in zip(paths, hashes, classified):
+        fname = os.path.basename(img_path)
+        if image_hash is None:
+            continue  # unreadable, already logged
+        if product_type == "UNKNOWN":
+            product_type = classifier.map_to_product_type(top5, fname)
+        logger.info(f"{fname}: {product_type}")
+        out_dir = out_dirs[img_path]
+        texts = text_inputs(product_type, config, img_path, args.unknown_title, args.unknown_subtitle)
+        fingerprints = card_fingerprints(image_hash, texts, args.variants, plans, context)
+        stale = fingerprints if args.full_rebuild else stale_cards(out_dir, fingerprints)
+        unchanged += len(fingerprints) - len(stale)
+        if not stale:
+            logger.info(f"{fname}: unchanged, skipped")
+            continue
+        seed = product_seed(args.seed, image_hash)
+        title, subtitle = pick_text(product_type, config, img_path, interactive=False,
+                                    unknown_title=args.unknown_title, unknown_subtitle=args.unknown_subtitle,
+                                    rng=text_rng(seed))
+        jobs.append((img_path, title, subtitle, out_dir, args.variants, stale, seed))
+    if unchanged:
+        logger.info(f"Unchanged cards skipped: {unchanged} ({len(paths) - len(jobs)} images fully up to date)")
+    if class_cache is not None:
+        logger.info(f"Classification cache: {class_cache.stats()}")
+        class_cache.close()
+    if not jobs:
+        logger.info("Batch done: every card is up to date")
+        return
+
+    start = time.perf_counter()
+    done = failed = cards = 0
+    if args.workers <= 1:
+        _init_batch_worker(cutout_opts, seg_opts, args.asset_cache_mb, output_encoder(args), args.writer_threads,
+                           template_design(args))
+        results = map(_batch_job, jobs)
+        pool = None
+    else:
+        # spawn: workers must not inherit the parent's torch/onnxruntime thread pools
+        pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_batch_worker,
+                                   initargs=(cutout_opts, seg_opts, args.asset_cache_mb,
+                                             output_encoder(args), args.writer_threads, template_design(args)))
+        results = (f.result() for f in as_completed([pool.submit(_batch_job, job) for job in jobs]))
+    try:
+        for img_path, n_saved, error in results:
+            done += 1
+            cards += n_saved
+            if n_saved:
+                log_first_card()
+            if error:
+                failed += 1
+                logger.error(f"[{done}/{len(jobs)}] {img_path} failed: {error}")
+            else:
+                logger.info(f"[{done}/{len(jobs)}] {img_path}: {n_saved} cards")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    elapsed = time.perf_counter() - start
+    logger.info(f"Batch done: {done - failed}/{len(jobs)} images, {cards} cards in {elapsed:.1f}s "
+                f"({len(jobs) / elapsed if elapsed else 0:.2f} images/s, {args.workers} workers), "
+                f"{unchanged} unchanged cards skipped")
+
+def parse_seed(value: str) -> Optional[int]:
+    """--seed value: an integer, or 'none' for unseeded (different) cards on every run."""
+    if value.lower() == "none":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Bad seed: {value!r} (expected an integer or 'none')") from None
+
+def parse_stage_workers(spec: str) -> Dict[str, int]:
+    """'segment=2,render=4' -> worker count per pipeline stage (1 for stages not mentioned)."""
+    workers = {name: 1 for name in PIPELINE_STAGES}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, count = part.partition("=")
+        if name not in workers or not count.isdigit():
+            raise argparse.ArgumentTypeError(f"Bad stage worker spec: {part!r}")
+        workers[name] = int(count)
+    return workers
+
+def run_pipeline_batch(args, classifier: ProductClassifier, config: Dict, cutout_opts: Optional[Dict],
+                       seg_opts: Dict) -> None:
+    """
+    Non-interactive mode as a streaming pipeline: decode -> segment -> classify -> render -> encode.
+    Stages run on their own threads joined by bounded queues, so segmentation, CNN inference and PNG
+    writes overlap while only a few images are held in memory at a time.
+    Only cards whose fingerprint changed are rendered (unless --full-rebuild); an image whose cards are
+    all unchanged and whose classification is cached passes through without being decoded or segmented.
+    """
+    paths = list_batch_inputs(args.input, args.glob)
+    if not paths:
+        logger.error(f"No images found in {args.glob or args.input}")
+        return
+    workers = args.stage_workers
+    cutout_cache = CutoutCache(**cutout_opts) if cutout_opts else None
+    class_cache = ClassificationCache(args.class_cache) if args.class_cache else None
+    renderers = threading.local()  # one renderer per render thread, with that thread's fonts (text_layout.get_font)
+    assets = AssetCache(args.asset_cache_mb * 1024**2)  # shared by all render threads
+    plans = template_plans(args)  # compiled once, shared read-only by all render threads
+    seg_opts = check_seg_proxy(paths, seg_opts, args.seg_proxy_min_accuracy)
+    context = fingerprint_context(args, seg_opts)
+    # The CNN sees the decoded image, which is downscaled to max_size: its results are cached apart
+    # from the full-resolution ones of batch and interactive mode
+    model_id = classifier.model_id + (f"@{seg_opts['max_size']}px" if seg_opts.get("max_size") else "")
+
+    out_dirs = output_dirs(args.output, paths)
+
+    def output_dir(job: Dict) -> str:
+        return out_dirs[job["path"]]
+
+    def plan_cards(job: Dict, top5: List[Tuple[str, float]], product_type: str) -> str:
+        """Sets job["fingerprints"] to the cards to render and job["unchanged"]; returns the final product type."""
+        if product_type == "UNKNOWN":
+            product_type = classifier.map_to_product_type(top5, os.path.basename(job["path"]))
+        texts = text_inputs(product_type, config, job["path"], args.unknown_title, args.unknown_subtitle)
+        fingerprints = card_fingerprints(job["hash"], texts, args.variants, plans, context)
+        job["fingerprints"] = fingerprints if args.full_rebuild else stale_cards(output_dir(job), fingerprints)
+        job["unchanged"] = len(fingerprints) - len(job["fingerprints"])
+        return product_type
+
+    def decode(img_path: str) -> Dict:
+        with open(img_path, "rb") as f:
+            data = f.read()
+        job = {"path": img_path, "hash": hashlib.sha256(data).hexdigest()}
+        # looked up once here; classify() uses the result instead of asking the cache again
+        job["classified"] = cached = class_cache.get(job["hash"], model_id) if class_cache is not None else None
+        if cached is not None and not args.full_rebuild:
+            plan_cards(job, *cached)
+            if not job["fingerprints"]:
+                return job  # nothing to render
+        job["data"] = data
+        job["original"] = load_image(data, seg_opts.get("max_size"))
+        return job
+
+    def segment(job: Dict) -> Dict:
+        if "data" in job:
+            job["no_bg"] = remove_background_bytes(job["data"], cutout_cache, original=job["original"],
+                                                   **seg_opts)
+        return job
+
+    def classify(job: Dict) -> Dict:
+        if "data" not in job:
+            return job
+        fname = os.path.basename(job["path"])
+        del job["data"]
+        content_hash = job["hash"]
+        cached = job.pop("classified")
+        if cached is not None:
+            top5, product_type = cached
+        else:
+            try:
+                top5 = classifier.classify_image(job["original"])
+            except Exception as e:
+                logger.error(f"Failed to classify {job['path']}: {e}")
+                top5 = []
+            product_type = classifier.map_to_product_type(top5)
+            if class_cache is not None and top5:
+                class_cache.put(content_hash, model_id, top5, product_type)
+        del job["original"]
+        product_type = plan_cards(job, top5, product_type)
+        logger.info(f"{fname}: {product_type}")
+        job["seed"] = product_seed(args.seed, content_hash)
+        job["title"], job["subtitle"] = pick_text(product_type, config, job["path"], interactive=False,
+                                                  unknown_title=args.unknown_title,
+                                                  unknown_subtitle=args.unknown_subtitle,
+                                                  rng=text_rng(job["seed"]))
+        return job
+
+    def render(job: Dict) -> Dict:
+        if "no_bg" not in job:
+            job["cards"] = []
+            return job
+        renderer = getattr(renderers, "renderer", None)
+        if renderer is None:
+            renderer = renderers.renderer = CardRenderer(BG_FOLDER, BG_TITLE_FOLDER, assets, plans)
+        job["cards"] = list(renderer.render_product(job.pop("no_bg"), job["title"], job["subtitle"], args.variants,
+                                                    os.path.basename(job["path"]), set(job["fingerprints"]),
+                                                    job["seed"]))
+        return job
+
+    encoder = output_encoder(args)
+
+    def encode(job: Dict) -> Dict:
+        job["saved"] = []
+        if not job["cards"]:
+            return job
+        out_dir = output_dir(job)
+        os.makedirs(out_dir, exist_ok=True)
+        store = FingerprintStore(out_dir)
+        for name, img in job.pop("cards"):
+            job["saved"].append(encoder.save(img, os.path.join(out_dir, name)))
+            store.record(name, job["fingerprints"][name], job["saved"][-1])
+        store.save()
+        return job
+
+    stages = [Stage(name, fn, workers[name], args.queue_size)
+              for name, fn in zip(PIPELINE_STAGES, (decode, segment, classify, render, encode))]
+    start = time.perf_counter()
+    done = failed = cards = unchanged = 0
+    for result in run_pipeline(paths, stages):
+        done += 1
+        if isinstance(result, StageError):
+            failed += 1
+            path = result.item["path"] if isinstance(result.item, dict) else result.item
+            logger.error(f"[{done}/{len(paths)}] {path} failed in {result.stage}: {result.error}")
+        else:
+            cards += len(result["saved"])
+            if result["saved"]:
+                log_first_card()
+            unchanged += result["unchanged"]
+            logger.info(f"[{done}/{len(paths)}] {result['path']}: {len(result['saved'])} cards, "
+                        f"{result['unchanged']} unchanged")
+    elapsed = time.perf_counter() - start
+    logger.info(f"Pipeline done: {done - failed}/{len(paths)} images, {cards} cards in {elapsed:.1f}s "
+                f"({len(paths) / elapsed if elapsed else 0:.2f} images/s), {unchanged} unchanged cards skipped")
+    if cutout_cache is not None:
+        logger.info(f"Cut-out cache: {cutout_cache.stats()}")
+    if class_cache is not None:
+        logger.info(f"Classification cache: {class_cache.stats()}")
+        class_cache.close()
+
 def main():
     parser = argparse.ArgumentParser(description="Generate product cards with pre-loaded backgrounds.")
     parser.add_argument("--input", default="inputs", help="Input folder path")
     parser.add_argument("--output", default="Results", help="Output folder path")
     parser.add_argument("--variants", type=int, default=NUM_VARIANTS, help="Number of variants per image")
+    parser.add_argument("--cutout-cache", default=CUTOUT_CACHE_DIR,
+                        help="Folder for cached background-removal results ('' disables the cache)")
+    parser.add_argument("--cutout-store", choices=STORE_MODES, default="rgba",
+                        help="Cache the full RGBA cut-out or only its alpha mask")
+    parser.add_argument("--cutout-cache-max-mb", type=int, default=2048, help="Cut-out cache size limit in MB")
+    parser.add_argument("--cutout-cache-max-age", type=float, default=None,
+                        help="Drop cached cut-outs older than this many days")
+    parser.add_argument("--seg-model", choices=sorted(SEGMENTATION_MODELS), default="u2net",
+                        help="Background-removal model")
+    parser.add_argument("--seg-intra-threads", type=int, default=None, help="onnxruntime intra-op threads")
+    parser.add_argument("--seg-inter-threads", type=int, default=None, help="onnxruntime inter-op threads")
+    parser.add_argument("--seg-max-size", type=int, default=None,
+                        help="Longest side of the cut-out in px; larger photos are downscaled while decoding")
+    parser.add_argument("--seg-proxy", type=int, default=None,
+                        help="Segment a copy no larger than this (px, e.g. 1024) and upsample the mask")
+    parser.add_argument("--seg-proxy-min-accuracy", type=float, default=0.95,
+                        help="Fall back to full-resolution segmentation if the proxy's edge accuracy on the "
+                             "largest input is below this (0 skips the check)")
+    parser.add_argument("--backend", choices=CLASSIFIER_BACKENDS, default="fp32",
+                        help="Classifier backend: fp32 torch, int8 quantized torch or ONNX Runtime")
+    parser.add_argument("--class-cache", default=CLASSIFICATION_CACHE_DB,
+                        help="SQLite file caching classification results ('' disables the cache)")
+    parser.add_argument("--asset-cache-mb", type=int, default=ASSET_CACHE_MB,
+                        help="Memory budget for decoded, pre-resized background images")
+    parser.add_argument("--batch-size", type=int, default=16, help="Classification batch size")
+    parser.add_argument("--decode-workers", type=int, default=4,
+                        help="Threads decoding and preprocessing images for classification")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="png",
+                        help="Card format: png, palette png8 (small, for flat designs), webp or jpeg")
+    parser.add_argument("--png-compress", type=int, default=6, choices=range(10), metavar="0-9",
+                        help="PNG zlib level (1 is about twice as fast as the default 6, ~20%% larger)")
+    parser.add_argument("--quality", type=int, default=90, help="WebP/JPEG quality")
+    parser.add_argument("--writer-threads", type=int, default=2,
+                        help="Background threads encoding and writing cards (pipeline mode: use --stage-workers encode=N)")
+    parser.add_argument("--design", default=None,
+                        help="Also render the cards of this design from the templates file (e.g. designe1)")
+    parser.add_argument("--templates", default=TEMPLATE_FILE, help="Design templates file (see templates.py)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Non-interactive: process every image in --input (or --glob) without prompts")
+    parser.add_argument("--glob", default=None, help="Batch mode: glob pattern of input images, e.g. 'photos/**/*.jpg'")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Batch mode: number of rendering processes")
+    parser.add_argument("--seed", type=parse_seed, default=0,
+                        help="Seed of the random choices (texts, backgrounds, product scale), combined with each "
+                             "image's content: the same inputs give byte-identical cards. 'none': random every run")
+    parser.add_argument("--full-rebuild", action="store_true",
+                        help="Batch mode: render every card, even those whose inputs are unchanged since the last run")
+    parser.add_argument("--unknown-title", default=None,
+                        help="Batch mode: title for UNKNOWN products without a side-car .json")
+    parser.add_argument("--unknown-subtitle", default=None,
+                        help="Batch mode: subtitle for UNKNOWN products without a side-car .json")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Batch mode: stream images through threaded decode/segment/classify/render/encode stages")
+    parser.add_argument("--stage-workers", type=parse_stage_workers, default="segment=2,render=2,encode=2",
+                        help="Pipeline mode: threads per stage, e.g. 'decode=1,segment=2,classify=1,render=4,encode=2'")
+    parser.add_argument("--queue-size", type=int, default=4, help="Pipeline mode: capacity of each stage queue")
     args = parser.parse_args()
+    if args.design:
+        try:
+            template_plans(args)  # validate the design file up front; workers reload it from the same path
+        except (OSError, KeyError, TemplateError) as e:
+            parser.error(f"--design: {e}")
 
     os.makedirs(args.output, exist_ok=True)
-    classifier = ProductClassifier()
-    renderer = CardRenderer(BG_FOLDER, BG_TITLE_FOLDER)
+    classifier = ProductClassifier(backend=args.backend)
     config = load_config(CONFIG_FILE)
+    cutout_opts = None
+    if args.cutout_cache:
+        cutout_opts = {"cache_dir": args.cutout_cache, "store": args.cutout_store,
+                       "max_bytes": args.cutout_cache_max_mb * 1024**2, "max_age_days": args.cutout_cache_max_age}
+    seg_opts = {"model_name": args.seg_model, "intra_op_threads": args.seg_intra_threads,
+                "inter_op_threads": args.seg_inter_threads, "proxy_size": args.seg_proxy,
+                "max_size": args.seg_max_size}
+
+    if args.batch:
+        parallel = args.stage_workers["segment"] if args.pipeline else args.workers
+        if parallel > 1 and not args.seg_intra_threads:
+            # Split the cores between parallel segmentations instead of oversubscribing them
+            seg_opts["intra_op_threads"] = max(1, (os.cpu_count() or 1) // parallel)
+        if args.pipeline:
+            run_pipeline_batch(args, classifier, config, cutout_opts, seg_opts)
+        else:
+            run_batch(args, classifier, config, cutout_opts, seg_opts)
+        return
 
     files = sorted(f for f in os.listdir(args.input) if os.path.isfile(os.path.join(args.input, f)))
     if not files:
@@ -246,53 +1074,46 @@ def main():
         logger.info("No selection made.")
         return
 
-    for ch in [int(n.strip()) for n in choices.split(",") if n.strip().isdigit() and 1 <= int(n) <= len(files)]:
-        fname = files[ch - 1]
+    renderer = CardRenderer(BG_FOLDER, BG_TITLE_FOLDER, AssetCache(args.asset_cache_mb * 1024**2), template_plans(args))
+    cutout_cache = CutoutCache(**cutout_opts) if cutout_opts else None
+    writer = ImageWriter(output_encoder(args), args.writer_threads)
+
+    selected = [files[int(n.strip()) - 1] for n in choices.split(",") if n.strip().isdigit() and 1 <= int(n) <= len(files)]
+    seg_opts = check_seg_proxy([os.path.join(args.input, f) for f in selected], seg_opts, args.seg_proxy_min_accuracy)
+    class_cache = ClassificationCache(args.class_cache) if args.class_cache else None
+    hashes = content_hashes([os.path.join(args.input, f) for f in selected])
+    classified = classify_files(classifier, [os.path.join(args.input, f) for f in selected], class_cache,
+                                batch_size=args.batch_size, workers=args.decode_workers, hashes=hashes)
+    # computed over every listed file, so an image keeps its folder whichever files are selected
+    out_dirs = output_dirs(args.output, [os.path.join(args.input, f) for f in files])
+
+    for fname, image_hash, (top5, product_type) in zip(selected, hashes, classified):
+        if image_hash is None:
+            continue
         img_path = os.path.join(args.input, fname)
         logger.info(f"\nProcessing {fname}")
 
-        top5 = classifier.classify(img_path)
         for lbl, prob in top5:
             logger.info(f"  {lbl} -> {prob:.3f}")
 
-        product_type = classifier.map_to_product_type(top5, fname)
+        if product_type == "UNKNOWN":
+            product_type = classifier.map_to_product_type(top5, fname)
         logger.info(f"Product type: {product_type}")
 
-        no_bg = remove(Image.open(img_path).convert("RGBA"))
-        arr = np.array(no_bg)
-        avg_color = tuple(arr[:, :, :3][arr[:, :, 3] > 0].mean(axis=0).astype(int)) if np.any(arr[:, :, 3] > 0) else (128, 128, 128)
+        seed = product_seed(args.seed, image_hash)
+        title, subtitle = pick_text(product_type, config, img_path, interactive=True, rng=text_rng(seed))
+        out_dir = out_dirs[img_path]
+        saved = render_cards(img_path, title, subtitle, out_dir, renderer, args.variants, cutout_cache, seg_opts, writer,
+                             seed=seed)
+        if saved:
+            log_first_card()
+    writer.close()
 
-        if product_type == "UNKNOWN":
-            while True:
-                ans = input("Product not recognized. Enter custom text? (y/n): ").strip().lower()
-                if ans in ["y", "n"]:
-                    break
-                logger.info("Please enter 'y' or 'n'.")
-            if ans == "y":
-                title = input("Title (e.g., 'Dog Bowl'): ").strip() or "My Product"
-                subtitle = input("Subtitle (e.g., 'Non-slip design'): ").strip() or "No Info"
-                logger.info(f"Using custom text: Title='{title}', Subtitle='{subtitle}'")
-            else:
-                cfg = config["UNKNOWN"]
-                title = random.choice(cfg["titles"])
-                subtitle = random.choice(cfg["subtitles"])
-                logger.info(f"Using default text: Title='{title}', Subtitle='{subtitle}'")
-        else:
-            cfg = config.get(product_type, config["UNKNOWN"])
-            title = random.choice(cfg["titles"])
-            subtitle = random.choice(cfg["subtitles"])
-            logger.info(f"Using config text: Title='{title}', Subtitle='{subtitle}'")
-
-        out_dir = os.path.join(args.output, os.path.splitext(fname)[0])
-        os.makedirs(out_dir, exist_ok=True)
-        for i in range(args.variants):
-            try:
-                img = renderer.render(no_bg.copy(), avg_color, title, subtitle, i)
-                out_path = os.path.join(out_dir, f"variant_{i + 1}.png")
-                img.save(out_path)
-                logger.info(f"Saved: {out_path}")
-            except Exception as e:
-                logger.error(f"Error generating variant {i + 1} for {fname}: {e}")
+    if cutout_cache is not None:
+        logger.info(f"Cut-out cache: {cutout_cache.stats()}")
+    if class_cache is not None:
+        logger.info(f"Classification cache: {class_cache.stats()}")
+        class_cache.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
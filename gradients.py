@@ -0,0 +1,54 @@
+import math
+from typing import Tuple
+
+import numpy as np
+from PIL import Image
+
+Color = Tuple[int, int, int]
+
+
+def _blend(t: np.ndarray, start: Color, end: Color) -> np.ndarray:
+    """Interpolates start -> end by the parameter array t, returning uint8 colors of shape t.shape + (3,)."""
+    start = np.asarray(start, dtype=np.float64)
+    end = np.asarray(end, dtype=np.float64)
+    t = t[..., np.newaxis]
+    pix = (1 - t) * start + t * end
+    # Truncation (not rounding) matches the original per-pixel uint8 assignment
+    return pix.clip(0, 255).astype(np.uint8)
+
+
+def linear_gradient(width: int, height: int, top_color: Color, bottom_color: Color) -> Image.Image:
+    """Vertical gradient from top_color (first row) to bottom_color (last row)."""
+    rows = _blend(np.arange(height, dtype=np.float64) / max(height - 1, 1), top_color, bottom_color)
+    pix = np.ascontiguousarray(np.broadcast_to(rows[:, np.newaxis, :], (height, width, 3)))
+    return Image.fromarray(pix, "RGB")
+
+
+def radial_gradient(width: int, height: int, inner_color: Color, outer_color: Color) -> Image.Image:
+    """Radial gradient from the canvas center (inner_color) to the corners (outer_color)."""
+    cx, cy = width // 2, height // 2
+    max_r = math.sqrt(cx**2 + cy**2) or 1.0
+    ys, xs = np.ogrid[:height, :width]
+    t = np.sqrt((xs - cx) ** 2 + (ys - cy) ** 2) / max_r
+    return Image.fromarray(_blend(t, inner_color, outer_color), "RGB")
+
+
+def diagonal_gradient(width: int, height: int, start_color: Color, end_color: Color) -> Image.Image:
+    """Diagonal gradient from the top-left corner (start_color) towards the bottom-right (end_color)."""
+    # Color depends only on x + y, so blend one lookup row and index into it
+    lut = _blend(np.arange(width + height, dtype=np.float64) / (width + height), start_color, end_color)
+    ys, xs = np.ogrid[:height, :width]
+    return Image.fromarray(lut[xs + ys], "RGB")
+
+
+def conic_gradient(width: int, height: int, start_color: Color, end_color: Color,
+                   angle: float = 0.0) -> Image.Image:
+    """
+    Conic (angular) gradient around the canvas center.
+    angle is the starting direction in degrees, measured clockwise from "right".
+    """
+    cx, cy = width // 2, height // 2
+    ys, xs = np.ogrid[:height, :width]
+    theta = np.arctan2(ys - cy, xs - cx) - math.radians(angle)
+    t = np.mod(theta, 2 * math.pi) / (2 * math.pi)
+    return Image.fromarray(_blend(t, start_color, end_color), "RGB")
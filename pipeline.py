@@ -0,0 +1,113 @@
+import logging
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class Stage:
+    """One pipeline step: fn(item) -> item, run by `workers` threads, fed by a queue of `queue_size` items."""
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1, queue_size: int = 4):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+
+
+class StageError:
+    """Result placeholder for an item that failed in a stage; later stages pass it through untouched."""
+    def __init__(self, stage: str, item: Any, error: BaseException):
+        self.stage = stage
+        self.item = item
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f"StageError({self.stage!r}, {self.error!r})"
+
+
+def run_pipeline(items: Iterable[Any], stages: List[Stage]) -> Iterator[Any]:
+    """
+    Streams items through stages joined by bounded queues and yields results as they finish
+    (not in input order). A full queue blocks the stage feeding it, so at most about
+    sum(queue_size + workers) items are in flight however long `items` is.
+    Exceptions are isolated per item and yielded as StageError. Closing the generator early
+    stops all stages and waits for their threads, each finishing at most the item it is on.
+    """
+    queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+    out_q: "queue.Queue" = queue.Queue(maxsize=max(1, stages[-1].queue_size) if stages else 1)
+    stop = threading.Event()
+
+    def put(q: "queue.Queue", item: Any) -> bool:
+        # Blocks for backpressure but gives up once the consumer has gone away
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(q: "queue.Queue") -> Any:
+        # Same polling as put: a worker waiting for input exits once the consumer has gone away
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def feed() -> None:
+        first_q = queues[0] if queues else out_q
+        try:
+            for item in items:
+                if not put(first_q, item):
+                    return
+        except Exception as e:
+            put(first_q, StageError("source", None, e))
+        finally:
+            put(first_q, _DONE)
+
+    def work(index: int, stage: Stage, remaining: List[int], lock: threading.Lock) -> None:
+        in_q = queues[index]
+        next_q = queues[index + 1] if index + 1 < len(stages) else out_q
+        while not stop.is_set():
+            item = get(in_q)
+            if item is _DONE:
+                put(in_q, _DONE)  # let sibling workers see it too
+                break
+            if not isinstance(item, StageError):
+                try:
+                    item = stage.fn(item)
+                except Exception as e:
+                    logger.debug(f"Stage {stage.name} failed", exc_info=True)
+                    item = StageError(stage.name, item, e)
+            if not put(next_q, item):
+                return
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            put(next_q, _DONE)
+
+    threads = [threading.Thread(target=feed, name="pipeline-source", daemon=True)]
+    for index, stage in enumerate(stages):
+        remaining, lock = [stage.workers], threading.Lock()
+        for n in range(stage.workers):
+            threads.append(threading.Thread(target=work, args=(index, stage, remaining, lock),
+                                            name=f"pipeline-{stage.name}-{n}", daemon=True))
+    for t in threads:
+        t.start()
+
+    try:
+        while True:
+            item = out_q.get()
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
@@ -0,0 +1,68 @@
+import logging
+import math
+from typing import NamedTuple, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class PreparedProduct(NamedTuple):
+    """
+    A cut-out prepared once per product and shared by all of its variants.
+    image is trimmed and no larger than the biggest size any variant draws; it is shared,
+    so renderers must only read it (paste it, resize it) and never draw on it.
+    source_size is the trimmed size before downscaling, which layouts scale from.
+    """
+    image: Image.Image
+    source_size: Tuple[int, int]
+    bbox: Optional[Tuple[int, int, int, int]]
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.image.size
+
+    def scaled_size(self, area: float) -> Tuple[int, int]:
+        """Size the trimmed product has when scaled to cover `area` pixels."""
+        w, h = self.source_size
+        scale = math.sqrt(area / (w * h))
+        return int(w * scale), int(h * scale)
+
+    def scaled(self, area: float) -> Image.Image:
+        """The product scaled to `area` pixels; the shared image itself when it already has that size."""
+        size = self.scaled_size(area)
+        if size == self.image.size:
+            return self.image
+        return self.image.resize(size, Image.LANCZOS)
+
+
+def trim_transparent(img: Image.Image) -> Tuple[Image.Image, Optional[Tuple[int, int, int, int]]]:
+    """Crops transparent borders; returns the cropped RGBA image and the crop box (None if fully transparent)."""
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    bbox = img.getchannel("A").getbbox()
+    if not bbox:
+        # No non-transparent pixels: keep the image (shouldn't happen post-rembg)
+        logger.warning("No non-transparent pixels found in image after trimming.")
+        return img, None
+    if bbox != (0, 0) + img.size:
+        return img.crop(bbox), bbox
+    return img, bbox
+
+
+def prepare_product(cutout: Image.Image, max_area: Optional[float] = None, trim: bool = True) -> PreparedProduct:
+    """
+    Trims transparent borders (unless trim=False) and downscales the cut-out to max_area pixels
+    when it is larger, so variants never resample the full-resolution photo. Smaller products
+    are kept as they are and scaled up by the variants that need it.
+    """
+    if trim:
+        image, bbox = trim_transparent(cutout)
+    else:
+        image, bbox = cutout, None
+    source_size = image.size
+    w, h = source_size
+    if max_area is not None and w * h > max_area:
+        scale = math.sqrt(max_area / (w * h))
+        image = image.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
+    return PreparedProduct(image, source_size, bbox)
@@ -0,0 +1,185 @@
+import io
+import math
+import threading
+from typing import Optional
+
+from PIL import Image, ImageChops, ImageFilter
+
+from cutout_cache import CutoutCache
+
+DEFAULT_MODEL = "u2net"
+
+# Short CLI names -> rembg model names
+SEGMENTATION_MODELS = {
+    "u2net": "u2net",
+    "u2netp": "u2netp",
+    "isnet": "isnet-general-use",
+    "silueta": "silueta",
+}
+
+# Alpha values the mask refinement snaps to fully transparent / fully opaque
+REFINE_LOW = 8
+REFINE_HIGH = 247
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _new_session(model_name: str, intra_op_threads: Optional[int], inter_op_threads: Optional[int]):
+    import onnxruntime as ort
+    from rembg.sessions import sessions_class
+
+    session_class = next((sc for sc in sessions_class if sc.name() == model_name), None)
+    if session_class is None:
+        raise ValueError(f"Unknown segmentation model: {model_name}")
+    sess_opts = ort.SessionOptions()
+    if intra_op_threads:
+        sess_opts.intra_op_num_threads = intra_op_threads
+    if inter_op_threads:
+        sess_opts.inter_op_num_threads = inter_op_threads
+    return session_class(model_name, sess_opts)
+
+
+def get_session(model_name: str = DEFAULT_MODEL, intra_op_threads: Optional[int] = None,
+                inter_op_threads: Optional[int] = None):
+    """
+    Returns the process-wide rembg session for model_name, loading the ONNX model on first use.
+    Thread counts of None leave the onnxruntime defaults in place.
+    """
+    model_name = SEGMENTATION_MODELS.get(model_name, model_name)
+    key = (model_name, intra_op_threads, inter_op_threads)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _new_session(model_name, intra_op_threads, inter_op_threads)
+            _sessions[key] = session
+    return session
+
+
+def load_image(data: bytes, max_size: Optional[int] = None) -> Image.Image:
+    """
+    Decodes image bytes to RGBA, no larger than max_size on the long side.
+    JPEGs are downscaled by the decoder itself, so a 12 MP photo is never fully decoded.
+    """
+    img = Image.open(io.BytesIO(data))
+    if max_size and max(img.size) > max_size:
+        k = max_size / max(img.size)
+        img.draft("RGB", (math.ceil(img.width * k), math.ceil(img.height * k)))
+    img = img.convert("RGBA")
+    if max_size and max(img.size) > max_size:
+        img.thumbnail((max_size, max_size), Image.LANCZOS)
+    return img
+
+
+def fit_size(img: Image.Image, max_size: Optional[int]) -> Image.Image:
+    """img downscaled to max_size on the long side (img itself when it already fits)."""
+    if not max_size or max(img.size) <= max_size:
+        return img
+    img = img.copy()
+    img.thumbnail((max_size, max_size), Image.LANCZOS)
+    return img
+
+
+def refine_mask(mask: Image.Image, low: int = REFINE_LOW, high: int = REFINE_HIGH) -> Image.Image:
+    """
+    Cleans an upsampled alpha mask: the faint halo resampling leaves around the product (which would
+    also widen the trimmed box) becomes fully transparent, near-opaque pixels become opaque, and the
+    edge ramp in between is stretched linearly.
+    """
+    lut = [0 if v <= low else 255 if v >= high else round((v - low) * 255 / (high - low)) for v in range(256)]
+    return mask.point(lut)
+
+
+def _segment(original: Image.Image, session, proxy_size: Optional[int], **params) -> Image.Image:
+    from rembg import remove
+    if not proxy_size or max(original.size) <= proxy_size:
+        return remove(original, session=session, **params)
+    proxy = fit_size(original, proxy_size)
+    mask = remove(proxy, session=session, only_mask=True, **params)
+    mask = refine_mask(mask.resize(original.size, Image.BICUBIC))
+    return Image.composite(original, Image.new("RGBA", original.size, 0), mask)
+
+
+def remove_background(img_path: str, cache: Optional[CutoutCache] = None, model_name: str = DEFAULT_MODEL,
+                      intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None,
+                      proxy_size: Optional[int] = None, max_size: Optional[int] = None,
+                      **params) -> Image.Image:
+    """
+    Removes the background of the image at img_path and returns an RGBA cut-out.
+    With a cache, unchanged photos are served from disk and segmentation is skipped.
+    proxy_size segments a copy no larger than that on the long side and upsamples the refined mask;
+    max_size bounds the cut-out itself (None keeps the photo's resolution).
+    Extra params are passed to rembg.remove and are part of the cache key.
+    """
+    with open(img_path, "rb") as f:
+        data = f.read()
+    return remove_background_bytes(data, cache, model_name, intra_op_threads, inter_op_threads,
+                                   proxy_size=proxy_size, max_size=max_size, **params)
+
+
+def remove_background_bytes(data: bytes, cache: Optional[CutoutCache] = None, model_name: str = DEFAULT_MODEL,
+                            intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None,
+                            original: Optional[Image.Image] = None, proxy_size: Optional[int] = None,
+                            max_size: Optional[int] = None, **params) -> Image.Image:
+    """Same as remove_background for an already-read file; original is the decoded RGBA image, if available."""
+    model_name = SEGMENTATION_MODELS.get(model_name, model_name)
+
+    def decoded() -> Image.Image:
+        return load_image(data, max_size) if original is None else fit_size(original, max_size)
+
+    key = None
+    if cache is not None:
+        key_params = dict(params)
+        if proxy_size:
+            key_params["proxy_size"] = proxy_size
+        if max_size:
+            key_params["max_size"] = max_size
+        key = cache.make_key(data, model_name, key_params)
+        # The key only needs the raw bytes: a hit decodes the photo only to rebuild an alpha-only entry
+        cutout = cache.get(key, decoded)
+        if cutout is not None:
+            return cutout
+
+    original = decoded()
+    session = get_session(model_name, intra_op_threads, inter_op_threads)
+    cutout = _segment(original, session, proxy_size, **params)
+    if cache is not None:
+        cache.put(key, cutout)
+    return cutout
+
+
+def edge_accuracy(reference: Image.Image, candidate: Image.Image, band: int = 3, threshold: int = 128) -> float:
+    """
+    Agreement of two masks (or RGBA cut-outs) along the reference edge: the share of pixels within
+    `band` px of the reference boundary where both masks fall on the same side of `threshold`.
+    1.0 means identical edges. The candidate is resized to the reference size if needed.
+    """
+    def binary(img: Image.Image) -> Image.Image:
+        alpha = img.getchannel("A") if img.mode == "RGBA" else img.convert("L")
+        if alpha.size != reference.size:
+            alpha = alpha.resize(reference.size, Image.BILINEAR)
+        return alpha.point([0] * threshold + [255] * (256 - threshold))
+
+    ref, cand = binary(reference), binary(candidate)
+    size = 2 * band + 1
+    edge = ImageChops.difference(ref.filter(ImageFilter.MaxFilter(size)), ref.filter(ImageFilter.MinFilter(size)))
+    edge_px = edge.histogram()[255]
+    if not edge_px:
+        return 1.0
+    wrong = ImageChops.multiply(edge, ImageChops.difference(ref, cand)).histogram()[255]
+    return 1.0 - wrong / edge_px
+
+
+def proxy_edge_accuracy(data: bytes, proxy_size: int, model_name: str = DEFAULT_MODEL,
+                        intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None,
+                        max_size: Optional[int] = None, band: int = 3, **params) -> float:
+    """
+    Segments one photo both at full resolution and through a proxy_size proxy (no cache) and
+    returns the edge_accuracy of the proxy mask, compared at the max_size output resolution.
+    Used to check that the proxy mode is good enough for a set of photos before relying on it.
+    """
+    original = load_image(data)
+    session = get_session(SEGMENTATION_MODELS.get(model_name, model_name), intra_op_threads, inter_op_threads)
+    reference = fit_size(_segment(original, session, None, **params), max_size)
+    candidate = _segment(fit_size(original, max_size), session, proxy_size, **params)
+    return edge_accuracy(reference, candidate, band)
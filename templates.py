@@ -0,0 +1,285 @@
+import hashlib
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from PIL import Image, ImageColor, ImageDraw
+
+from text_layout import FONT_FACES, Font, fit_text, get_font
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_FILE = "params.json"
+CARD_SIZE = (900, 1200)
+DEFAULT_BACKGROUND = "white"
+ALIGNMENTS = ("left", "center", "right")
+# Stacking order of layer kinds, bottom first; an element's "z" key overrides it
+LAYER_Z = {"product": 0, "image": 1, "text": 2}
+
+RGBA = Tuple[int, int, int, int]
+
+_REQUIRED = object()
+
+
+class TemplateError(ValueError):
+    """A design file that doesn't match the schema; the message names the offending key."""
+
+
+class Box(NamedTuple):
+    x: int
+    y: int
+    width: int
+    height: int
+
+    def place(self, size: Tuple[int, int], align: str) -> Tuple[int, int]:
+        """Top-left corner for content of `size`: aligned horizontally, centered vertically in the box."""
+        w, h = size
+        if align == "left":
+            x = self.x
+        elif align == "right":
+            x = self.x + self.width - w
+        else:
+            x = self.x + (self.width - w) // 2
+        return x, self.y + (self.height - h) // 2
+
+
+class TextLayer(NamedTuple):
+    name: str
+    box: Box
+    align: str
+    font: Font
+    color: RGBA
+    text: Optional[str]  # fixed text, or None to use texts[name] at render time
+
+    def __reduce__(self):
+        # Fonts loaded from memory (the built-in default) can't be pickled: process workers resolve the face again
+        return _text_layer, (self.name, self.box, self.align, self.font.face, self.font.size, self.color, self.text)
+
+
+def _text_layer(name: str, box: Box, align: str, face: str, size: int, color: RGBA, text: Optional[str]) -> TextLayer:
+    return TextLayer(name, box, align, get_font(face, size), color, text)
+
+
+class ImageLayer(NamedTuple):
+    name: str
+    box: Box
+    image: Image.Image  # already fitted into the box
+    position: Tuple[int, int]
+
+
+class ProductLayer(NamedTuple):
+    name: str
+    box: Box
+    align: str
+
+
+Layer = Union[TextLayer, ImageLayer, ProductLayer]
+
+
+class RenderPlan(NamedTuple):
+    """
+    One compiled card: canvas size, background and the layers to draw, bottom first.
+    Fonts, colors, geometry and static images are resolved at compile time; render() only places
+    the per-product content. Plans are shared and never modified.
+    """
+    design: str
+    card: str
+    size: Tuple[int, int]
+    background: RGBA
+    layers: Tuple[Layer, ...]
+    version: str = ""  # hash of the card's spec and logo files: changes whenever the card would render differently
+
+    @property
+    def name(self) -> str:
+        return f"{self.design}/{self.card}"
+
+    def render(self, product: Image.Image, texts: Optional[Dict[str, str]] = None,
+               background: Optional[Image.Image] = None) -> Image.Image:
+        """
+        Renders the card for one product (an RGBA cut-out, only read). texts maps text layer names
+        (e.g. "title") to the product's strings; background, if given, replaces the plain color.
+        """
+        texts = texts or {}
+        if background is not None:
+            canvas = background.convert("RGB").resize(self.size) if background.size != self.size \
+                else background.convert("RGB")
+        else:
+            canvas = Image.new("RGB", self.size, self.background[:3])
+        draw = ImageDraw.Draw(canvas)
+        for layer in self.layers:
+            if isinstance(layer, ProductLayer):
+                img = fit_into(product, layer.box)
+                canvas.paste(img, layer.box.place(img.size, layer.align), img)
+            elif isinstance(layer, ImageLayer):
+                canvas.paste(layer.image, layer.position, layer.image)
+            else:
+                text = layer.text if layer.text is not None else texts.get(layer.name, "")
+                if not text:
+                    continue
+                fit = fit_text(text, layer.font, layer.box.width)
+                x, y = layer.box.place((fit.width, fit.height), layer.align)
+                draw.text((x - fit.bbox[0], y - fit.bbox[1]), text, font=fit.font, fill=layer.color)
+        return canvas
+
+
+def fit_into(img: Image.Image, box: Box) -> Image.Image:
+    """img scaled to fit inside box, keeping its aspect ratio (img itself if it already fits exactly)."""
+    scale = min(box.width / img.width, box.height / img.height)
+    size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+    return img if size == img.size else img.resize(size, Image.LANCZOS)
+
+
+def _field(node: Dict[str, Any], key: str, path: str, types: tuple, default: Any = _REQUIRED) -> Any:
+    if not isinstance(node, dict):
+        raise TemplateError(f"{path}: expected an object")
+    if key not in node:
+        if default is _REQUIRED:
+            raise TemplateError(f"{path}.{key}: missing")
+        return default
+    value = node[key]
+    if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+        raise TemplateError(f"{path}.{key}: expected {' or '.join(t.__name__ for t in types)}, got {value!r}")
+    return value
+
+
+def _box(node: Dict[str, Any], path: str) -> Box:
+    pos = _field(node, "position", path, (dict,))
+    size = _field(node, "frame-size", path, (dict,))
+    box = Box(int(_field(pos, "x", f"{path}.position", (int, float))),
+              int(_field(pos, "y", f"{path}.position", (int, float))),
+              int(_field(size, "width", f"{path}.frame-size", (int, float))),
+              int(_field(size, "height", f"{path}.frame-size", (int, float))))
+    if box.width <= 0 or box.height <= 0:
+        raise TemplateError(f"{path}.frame-size: width and height must be positive")
+    return box
+
+
+def _align(node: Dict[str, Any], path: str) -> str:
+    align = _field(node, "align", path, (str,), "center")
+    if align not in ALIGNMENTS:
+        raise TemplateError(f"{path}.align: expected one of {ALIGNMENTS}, got {align!r}")
+    return align
+
+
+def _color(value: Any, path: str) -> RGBA:
+    """A color name, "#hex" / "rgb(...)" string or a [r, g, b(, a)] list."""
+    if isinstance(value, list) and len(value) in (3, 4) and all(isinstance(c, int) and 0 <= c <= 255 for c in value):
+        return tuple(value) + (255,) * (4 - len(value))
+    try:
+        return ImageColor.getcolor(value, "RGBA")
+    except (ValueError, AttributeError, TypeError):
+        raise TemplateError(f"{path}: unknown color {value!r}") from None
+
+
+def _font_face(name: str, bold: bool, path: str) -> str:
+    """Registry face for a design font: '<name>-bold' or '<name>' if registered, else the default faces."""
+    for face in ((f"{name}-bold", name) if bold else (name,)):
+        if face in FONT_FACES:
+            return face
+    fallback = "bold" if bold else "regular"
+    logger.warning(f"{path}.font: font '{name}' is not registered in text_layout.FONT_FACES, using '{fallback}'")
+    return fallback
+
+
+def _compile_element(name: str, node: Any, path: str, base_dir: str) -> Optional[Tuple[int, Layer]]:
+    if not isinstance(node, dict):
+        raise TemplateError(f"{path}: expected an object")
+    box = _box(node, path)
+    z = _field(node, "z", path, (int,), None)
+    if "path" in node:
+        img_path = _field(node, "path", path, (str,))
+        full_path = img_path if os.path.isabs(img_path) else os.path.join(base_dir, img_path)
+        try:
+            img = Image.open(full_path).convert("RGBA")
+        except OSError:
+            logger.warning(f"{path}.path: can't open '{img_path}', layer skipped")
+            return None
+        img = fit_into(img, box)
+        layer = ImageLayer(name, box, img, box.place(img.size, _align(node, path)))
+        return LAYER_Z["image"] if z is None else z, layer
+    if "font" in node or "text-size" in node:
+        size = _field(node, "text-size", path, (int, float))
+        if size <= 0:
+            raise TemplateError(f"{path}.text-size: must be positive")
+        face = _font_face(_field(node, "font", path, (str,), "regular"),
+                          _field(node, "bold", path, (bool,), False), path)
+        text = _field(node, "text", path, (str,), "")
+        layer = TextLayer(name, box, _align(node, path), get_font(face, int(size)),
+                          _color(_field(node, "color", path, (str, list), "black"), f"{path}.color"), text or None)
+        return LAYER_Z["text"] if z is None else z, layer
+    if name == "product":
+        return LAYER_Z["product"] if z is None else z, ProductLayer(name, box, _align(node, path))
+    raise TemplateError(f"{path}: can't tell the element type (expected 'path', 'font'/'text-size' or name 'product')")
+
+
+def compile_card(design: str, card: str, spec: Any, base_dir: str = ".") -> RenderPlan:
+    """Validates one card of a design and compiles it into a RenderPlan."""
+    path = f"{design}.{card}"
+    if not isinstance(spec, dict):
+        raise TemplateError(f"{path}: expected an object")
+    version = hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8"))
+    spec = dict(spec)
+    size = spec.pop("size", None)
+    if size is None:
+        canvas = CARD_SIZE
+    else:
+        canvas = (int(_field(size, "width", f"{path}.size", (int, float))),
+                  int(_field(size, "height", f"{path}.size", (int, float))))
+    background = _color(spec.pop("background", DEFAULT_BACKGROUND), f"{path}.background")
+
+    layers: List[Tuple[int, int, Layer]] = []
+    for order, (name, node) in enumerate(spec.items()):
+        compiled = _compile_element(name, node, f"{path}.{name}", base_dir)
+        if compiled is not None:
+            layers.append((compiled[0], order, compiled[1]))
+    layers.sort(key=lambda item: item[:2])
+    for _, _, layer in layers:
+        if isinstance(layer, ImageLayer):
+            version.update(layer.image.tobytes())
+    return RenderPlan(design, card, canvas, background, tuple(layer for _, _, layer in layers), version.hexdigest())
+
+
+class TemplateLibrary:
+    """All designs of one design file, validated and compiled once: {design: {card: RenderPlan}}."""
+    def __init__(self, designs: Dict[str, Dict[str, RenderPlan]], source: Optional[str] = None):
+        self.designs = designs
+        self.source = source
+
+    @classmethod
+    def from_dict(cls, data: Any, base_dir: str = ".", source: Optional[str] = None) -> "TemplateLibrary":
+        if not isinstance(data, dict):
+            raise TemplateError("design file: expected an object of designs")
+        designs = {}
+        for design, cards in data.items():
+            if not isinstance(cards, dict) or not cards:
+                raise TemplateError(f"{design}: expected an object of cards")
+            designs[design] = {card: compile_card(design, card, spec, base_dir) for card, spec in cards.items()}
+        return cls(designs, source)
+
+    def plans(self, design: Optional[str] = None) -> List[RenderPlan]:
+        """Plans of one design (or of all designs), in file order."""
+        if design is not None and design not in self.designs:
+            raise KeyError(f"Unknown design '{design}' (available: {', '.join(self.designs)})")
+        names = [design] if design is not None else list(self.designs)
+        return [plan for name in names for plan in self.designs[name].values()]
+
+    def plan(self, design: str, card: str) -> RenderPlan:
+        return self.designs[design][card]
+
+
+@lru_cache(maxsize=8)
+def _load(path: str, mtime_ns: int) -> TemplateLibrary:
+    with open(path, encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise TemplateError(f"{path}: invalid JSON ({e})") from None
+    return TemplateLibrary.from_dict(data, os.path.dirname(path), path)
+
+
+def load_templates(path: str = TEMPLATE_FILE) -> TemplateLibrary:
+    """Loads and compiles a design file; repeated calls reuse the compiled library until the file changes."""
+    path = os.path.abspath(path)
+    return _load(path, os.stat(path).st_mtime_ns)
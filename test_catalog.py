@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from catalog import CatalogError, ResultsLog, parse_record, run_catalog
+
+
+def write_manifest(path, lines):
+    path.write_text("\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines) + "\n",
+                    encoding="utf-8")
+
+
+def read_journal(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_parse_record_keys_and_paths(tmp_path):
+    record = parse_record(json.dumps({"image": "a.jpg", "sku": 7, "price": 9.5}), 3, str(tmp_path))
+    assert record.key == "7"
+    assert record.image == str(tmp_path / "a.jpg")
+    assert record.texts == {"price": "9.5"}
+    unnamed = parse_record(json.dumps({"image": "dir/a b.jpg"}), 1)
+    assert unnamed.key.startswith("a b-") and unnamed.name.startswith("a_b-")
+    edited = parse_record(json.dumps({"image": "dir/a b.jpg", "title": "T"}), 1)
+    assert edited.key != unnamed.key  # an edited record without id counts as new work
+
+
+@pytest.mark.parametrize("line, message", [
+    ("{oops", "line 4: invalid JSON"),
+    ("[1]", "line 4: expected an object"),
+    ('{"title": "x"}', "line 4: 'image' must be a non-empty string"),
+    ('{"image": "a.jpg", "title": {}}', "line 4: 'title' must be a string"),
+    ('{"image": "a.jpg", "layouts": []}', "line 4: 'layouts' must be a non-empty list"),
+])
+def test_parse_record_errors(line, message):
+    with pytest.raises(CatalogError, match=message):
+        parse_record(line, 4)
+
+
+def test_resume_skips_finished_records_and_retries_failed_on_request(tmp_path):
+    manifest, results = tmp_path / "catalog.jsonl", tmp_path / "results.jsonl"
+    write_manifest(manifest, [
+        {"image": "a.jpg", "id": "A"},
+        "# comment",
+        "{broken",
+        {"image": "b.jpg", "id": "B"},
+        "",
+        {"image": "c.jpg", "id": "C"},
+    ])
+    calls = []
+
+    def render(record):
+        calls.append(record.key)
+        if record.key == "B" and calls.count("B") == 1:
+            raise RuntimeError("boom")
+        return {"1": f"{record.key}.png"}
+
+    first = run_catalog(str(manifest), str(results), render, fsync=False)
+    assert (first.ok, first.failed, first.skipped) == (2, 2, 0)
+    entries = read_journal(results)
+    assert [(e["key"], e["status"]) for e in entries] == [
+        ("A", "ok"), ("line-3", "failed"), ("B", "failed"), ("C", "ok")]
+    assert entries[2]["error"] == "RuntimeError: boom"
+
+    again = run_catalog(str(manifest), str(results), render, fsync=False)
+    assert (again.ok, again.failed, again.skipped) == (0, 0, 4)
+
+    retry = run_catalog(str(manifest), str(results), render, retry_failed=True, fsync=False)
+    assert (retry.ok, retry.failed, retry.skipped) == (1, 1, 2)  # B succeeds, the broken line fails again
+    assert calls == ["A", "B", "C", "B"]
+
+
+def test_journal_drops_a_half_written_last_line(tmp_path):
+    results = tmp_path / "results.jsonl"
+    results.write_text('{"key": "A", "status": "ok"}\n{"key": "B", "sta', encoding="utf-8")
+    with ResultsLog(str(results), fsync=False) as log:
+        assert log.completed() == {"A"}
+        log.write({"key": "C", "status": "failed"})
+        assert log.completed() == {"A", "C"}
+        assert log.completed(retry_failed=True) == {"A"}
+    assert [e["key"] for e in read_journal(results)] == ["A", "C"]
+
+
+def test_repeated_key_is_rendered_once(tmp_path):
+    manifest, results = tmp_path / "catalog.jsonl", tmp_path / "results.jsonl"
+    write_manifest(manifest, [{"image": "a.jpg", "id": "A"}, {"image": "a2.jpg", "id": "A"}])
+    calls = []
+    summary = run_catalog(str(manifest), str(results), lambda r: calls.append(r.image) or {}, fsync=False)
+    assert (summary.ok, summary.skipped) == (1, 1)
+    assert len(calls) == 1
@@ -0,0 +1,108 @@
+import importlib.util
+import json
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from fingerprint import FINGERPRINT_FILE, FingerprintStore, code_fingerprint, derive_seed, digest, folder_digest
+
+LAYOUTS = """
+    import os
+
+    SCALE = 2
+    NAMES = ["a", "b"]
+
+    def helper(x):
+        return x * SCALE
+
+    def layout_a(x):
+        return helper(x) + len(os.sep)
+
+    def layout_b(x):
+        return [name * x for name in NAMES]
+"""
+
+
+def load_layouts(folder, source=LAYOUTS):
+    """Imports a fresh copy of the layouts module from folder (same module name, new function objects)."""
+    folder.mkdir()
+    path = folder / "layouts.py"
+    path.write_text(textwrap.dedent(source), encoding="utf-8")
+    spec = importlib.util.spec_from_file_location("layouts", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_digest_is_canonical():
+    assert digest({"a": 1, "b": (1, 2)}) == digest({"b": [1, 2], "a": 1})
+    assert digest({"a": 1}) != digest({"a": 2})
+
+
+def test_code_fingerprint_is_stable_for_identical_code(tmp_path):
+    first, second = load_layouts(tmp_path / "1"), load_layouts(tmp_path / "2")
+    assert code_fingerprint(first.layout_a) == code_fingerprint(second.layout_a)
+    assert code_fingerprint(first.layout_a) != code_fingerprint(first.layout_b)
+
+
+@pytest.mark.parametrize("old, new, changed", [
+    ("return x * SCALE", "return x * SCALE + 1", "a"),  # a helper layout_a calls
+    ("SCALE = 2", "SCALE = 3", "a"),                    # a setting read through the helper
+    ('NAMES = ["a", "b"]', 'NAMES = ["a", "c"]', "b"),  # a list setting
+])
+def test_code_fingerprint_follows_helpers_and_settings(tmp_path, old, new, changed):
+    base = load_layouts(tmp_path / "base")
+    edited = load_layouts(tmp_path / "edited", LAYOUTS.replace(old, new))
+    for name in ("a", "b"):
+        same = code_fingerprint(getattr(base, f"layout_{name}")) == code_fingerprint(getattr(edited, f"layout_{name}"))
+        assert same == (name != changed)
+
+
+def test_folder_digest_tracks_names_and_contents(tmp_path):
+    (tmp_path / "bg.png").write_bytes(b"1")
+    (tmp_path / "notes.txt").write_bytes(b"x")
+    before = folder_digest(str(tmp_path), (".png",))
+    (tmp_path / "notes.txt").write_bytes(b"y")
+    assert folder_digest(str(tmp_path), (".png",)) == before
+    (tmp_path / "bg.png").write_bytes(b"2")
+    assert folder_digest(str(tmp_path), (".png",)) != before
+    assert folder_digest(str(tmp_path / "missing")) == digest(None)
+
+
+def test_store_staleness_and_persistence(tmp_path):
+    card = tmp_path / "variant_1.png"
+    store = FingerprintStore(str(tmp_path))
+    assert not store.is_current("variant_1", "fp1")
+    store.record("variant_1", "fp1", str(card))
+    assert not store.is_current("variant_1", "fp1")  # recorded, but the output file is missing
+    card.write_bytes(b"png")
+    store.save()
+
+    reloaded = FingerprintStore(str(tmp_path))
+    assert reloaded.is_current("variant_1", "fp1")
+    assert not reloaded.is_current("variant_1", "fp2")
+    assert reloaded.output("variant_1") == str(card)
+    assert json.loads((tmp_path / FINGERPRINT_FILE).read_text(encoding="utf-8"))["variant_1"]["fingerprint"] == "fp1"
+
+
+def test_unreadable_store_counts_as_empty(tmp_path):
+    (tmp_path / FINGERPRINT_FILE).write_text("{truncated", encoding="utf-8")
+    assert FingerprintStore(str(tmp_path)).entries == {}
+
+
+def test_derive_seed_is_a_stable_64_bit_seed():
+    seed = derive_seed(0, "a" * 64, "1")
+    assert 0 <= seed < 2**64
+    assert derive_seed(0, "a" * 64, "1") == seed
+    assert len({seed, derive_seed(1, "a" * 64, "1"), derive_seed(0, "b" * 64, "1"), derive_seed(0, "a" * 64, "2")}) == 4
+
+
+def test_derive_seed_does_not_depend_on_the_process():
+    # str hashes are randomized per process; the seed must not be
+    code = "from fingerprint import derive_seed; print(derive_seed(0, 'image', 'variant_1'))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         env={"PYTHONHASHSEED": "random"}, cwd=str(Path(__file__).parent))
+    assert int(out.stdout) == derive_seed(0, "image", "variant_1")
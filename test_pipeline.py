@@ -0,0 +1,31 @@
+import threading
+
+from pipeline import Stage, StageError, run_pipeline
+
+
+def pipeline_threads():
+    return [t for t in threading.enumerate() if t.name.startswith("pipeline-")]
+
+
+def test_results_and_errors_come_through():
+    def half(x):
+        if x == 3:
+            raise ValueError("odd one")
+        return x / 2
+
+    results = list(run_pipeline(range(6), [Stage("inc", lambda x: x + 1, workers=2), Stage("half", half)]))
+    errors = [r for r in results if isinstance(r, StageError)]
+    assert sorted(r for r in results if not isinstance(r, StageError)) == [0.5, 1, 2, 2.5, 3]
+    assert [(e.stage, e.item) for e in errors] == [("half", 3)]
+    assert not pipeline_threads()
+
+
+def test_consumer_breaking_early_shuts_the_pipeline_down():
+    results = run_pipeline(range(1000), [Stage("a", lambda x: x, workers=3, queue_size=2),
+                                         Stage("b", lambda x: x, workers=2, queue_size=1)])
+    next(results)
+    closer = threading.Thread(target=results.close, daemon=True)
+    closer.start()
+    closer.join(timeout=5)
+    assert not closer.is_alive(), "closing the pipeline hung"
+    assert not pipeline_threads()
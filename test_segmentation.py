@@ -0,0 +1,45 @@
+import io
+
+import pytest
+from PIL import Image
+
+import segmentation
+from cutout_cache import CutoutCache
+from segmentation import remove_background_bytes
+
+
+def png_bytes(size=(40, 30)):
+    buf = io.BytesIO()
+    Image.new("RGB", size, "red").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def cached_cutout(cache, data, **params):
+    """Stores a cut-out for data under the key remove_background_bytes looks up."""
+    key_params = {k: v for k, v in params.items() if v}
+    cutout = Image.new("RGBA", (40, 30), (0, 255, 0, 255))
+    cache.put(cache.make_key(data, segmentation.DEFAULT_MODEL, key_params), cutout)
+    return cutout
+
+
+def no_decode(*args, **kwargs):
+    raise AssertionError("the photo was decoded on a cache hit")
+
+
+@pytest.mark.parametrize("proxy_size", [None, 16])
+def test_rgba_hit_does_not_decode_the_photo(tmp_path, monkeypatch, proxy_size):
+    cache = CutoutCache(str(tmp_path), store="rgba")
+    data = png_bytes()
+    cutout = cached_cutout(cache, data, proxy_size=proxy_size)
+    monkeypatch.setattr(segmentation, "load_image", no_decode)
+    result = remove_background_bytes(data, cache, proxy_size=proxy_size)
+    assert result.tobytes() == cutout.tobytes()
+    assert cache.stats()["hits"] == 1
+
+
+def test_alpha_hit_recombines_the_decoded_photo(tmp_path):
+    cache = CutoutCache(str(tmp_path), store="alpha")
+    data = png_bytes()
+    cached_cutout(cache, data)
+    result = remove_background_bytes(data, cache)
+    assert result.getpixel((0, 0)) == (255, 0, 0, 255)  # RGB from the photo, alpha from the cache
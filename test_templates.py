@@ -0,0 +1,79 @@
+import json
+
+import pytest
+from PIL import Image
+
+from templates import CARD_SIZE, ImageLayer, ProductLayer, TemplateError, TextLayer, compile_card, load_templates
+
+
+def element(x=10, y=20, width=100, height=50, **extra):
+    return {"position": {"x": x, "y": y}, "frame-size": {"width": width, "height": height}, **extra}
+
+
+def test_compile_card_orders_layers_and_resolves_defaults():
+    plan = compile_card("d", "c", {
+        "title": element(**{"text-size": 20, "color": [255, 0, 0]}),
+        "product": element(),
+    })
+    assert plan.size == CARD_SIZE
+    assert [type(layer) for layer in plan.layers] == [ProductLayer, TextLayer]
+    title = plan.layers[1]
+    assert title.color == (255, 0, 0, 255)
+    assert title.align == "center"
+    assert title.text is None  # filled from texts["title"] at render time
+
+
+def test_z_overrides_layer_kind_order():
+    plan = compile_card("d", "c", {
+        "title": element(**{"text-size": 20, "z": -1}),
+        "product": element(),
+    })
+    assert [layer.name for layer in plan.layers] == ["title", "product"]
+
+
+@pytest.mark.parametrize("spec, message", [
+    ({"product": {"frame-size": {"width": 1, "height": 1}}}, "d.c.product.position: missing"),
+    ({"product": element(width=0)}, "d.c.product.frame-size: width and height must be positive"),
+    ({"product": element(x="10")}, "d.c.product.position.x: expected int or float"),
+    ({"title": element(**{"text-size": 0})}, "d.c.title.text-size: must be positive"),
+    ({"title": element(**{"text-size": 10, "color": "no-such-color"})}, "d.c.title.color: unknown color"),
+    ({"title": element(**{"text-size": 10, "align": "justify"})}, "d.c.title.align: expected one of"),
+    ({"title": element(**{"text-size": 10, "bold": "yes"})}, "d.c.title.bold: expected bool"),
+    ({"badge": element()}, "d.c.badge: can't tell the element type"),
+    ({"product": [1, 2]}, "d.c.product: expected an object"),
+])
+def test_compile_card_errors_name_the_key(spec, message):
+    with pytest.raises(TemplateError, match=message.replace(".", r"\.")):
+        compile_card("d", "c", spec)
+
+
+def test_missing_image_skips_the_layer(tmp_path):
+    plan = compile_card("d", "c", {"logo": element(path="missing.png"), "product": element()}, str(tmp_path))
+    assert [layer.name for layer in plan.layers] == ["product"]
+
+
+def test_version_changes_with_spec_and_logo_pixels(tmp_path):
+    Image.new("RGBA", (10, 10), "red").save(tmp_path / "logo.png")
+    spec = {"logo": element(path="logo.png"), "product": element()}
+    first = compile_card("d", "c", spec, str(tmp_path))
+    assert isinstance(first.layers[1], ImageLayer)
+    assert compile_card("d", "c", spec, str(tmp_path)).version == first.version
+    assert compile_card("d", "c", {**spec, "product": element(x=11)}, str(tmp_path)).version != first.version
+    Image.new("RGBA", (10, 10), "blue").save(tmp_path / "logo.png")
+    assert compile_card("d", "c", spec, str(tmp_path)).version != first.version
+
+
+def test_load_templates_reports_invalid_json_and_reloads_on_change(tmp_path):
+    path = tmp_path / "params.json"
+    path.write_text("{not json", encoding="utf-8")
+    with pytest.raises(TemplateError, match="invalid JSON"):
+        load_templates(str(path))
+    path.write_text(json.dumps({"d": {"c": {"product": element()}}}), encoding="utf-8")
+    library = load_templates(str(path))
+    assert [plan.name for plan in library.plans("d")] == ["d/c"]
+    with pytest.raises(KeyError):
+        library.plans("other")
+    empty = tmp_path / "empty.json"
+    empty.write_text(json.dumps({"d": {}}), encoding="utf-8")
+    with pytest.raises(TemplateError, match="d: expected an object of cards"):
+        load_templates(str(empty))
@@ -0,0 +1,133 @@
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+# Font faces by name: candidate files tried in order (Mac, Windows, then FreeType's own search path)
+FONT_FACES: Dict[str, List[str]] = {
+    "bold": [
+        "/System/Library/Fonts/Supplemental/Arial Bold.ttf",
+        "C:/Windows/Fonts/arialbd.ttf",
+        "arialbd.ttf",
+    ],
+    "regular": [
+        "/System/Library/Fonts/Supplemental/Arial.ttf",
+        "C:/Windows/Fonts/arial.ttf",
+        "arial.ttf",
+        "Arial.ttf",
+    ],
+}
+
+Font = Union[ImageFont.FreeTypeFont, ImageFont.ImageFont]
+
+# Measuring needs a Draw object but never touches its image
+_scratch_draw = ImageDraw.Draw(Image.new("L", (1, 1)))
+_resolve_lock = threading.Lock()
+_thread_fonts = threading.local()
+
+
+class TextFit(NamedTuple):
+    font: Font
+    size: int
+    bbox: Tuple[int, int, int, int]
+
+    @property
+    def width(self) -> int:
+        return self.bbox[2] - self.bbox[0]
+
+    @property
+    def height(self) -> int:
+        return self.bbox[3] - self.bbox[1]
+
+
+@lru_cache(maxsize=None)
+def _resolve_face(face: str) -> Optional[str]:
+    """First loadable file for a face name (or a plain font path); None means the built-in default font."""
+    for path in FONT_FACES.get(face, [face]):
+        try:
+            ImageFont.truetype(path, 10)
+            return path
+        except OSError:
+            continue
+    logger.warning(f"No font file found for '{face}', using the default font.")
+    return None
+
+
+def get_font(face: str, size: int) -> Font:
+    """
+    Font registry: one font object per (face, size) and thread. A FreeType face must not be used by two
+    threads at once, so render threads never share font objects; face files are resolved once per process.
+    """
+    fonts = getattr(_thread_fonts, "fonts", None)
+    if fonts is None:
+        fonts = _thread_fonts.fonts = {}
+    font = fonts.get((face, size))
+    if font is None:
+        with _resolve_lock:
+            path = _resolve_face(face)
+        font = ImageFont.truetype(path, size) if path else ImageFont.load_default(size=size)
+        font.face = face
+        fonts[face, size] = font
+    return font
+
+
+@lru_cache(maxsize=8192)
+def _measure_face(text: str, face: str, size: int) -> Tuple[int, int, int, int]:
+    return _scratch_draw.textbbox((0, 0), text, font=get_font(face, size))
+
+
+def measure(text: str, font: Font) -> Tuple[int, int, int, int]:
+    """Bounding box of text as ImageDraw.textbbox((0, 0), ...) reports it; memoized for registry fonts."""
+    face = getattr(font, "face", None)
+    if face is not None:
+        return _measure_face(text, face, font.size)
+    return _scratch_draw.textbbox((0, 0), text, font=font)
+
+
+def font_variant(font: Font, size: int) -> Font:
+    face = getattr(font, "face", None)
+    return get_font(face, size) if face is not None else font.font_variant(size=size)
+
+
+def fit_text(text: str, font: Font, max_width: Optional[int], min_size: int = 10, step: int = 2) -> TextFit:
+    """
+    Largest font size that fits text into max_width, searching the sizes font.size, font.size - step, ...
+    and stopping at the first one <= min_size (used even if the text still does not fit).
+    Gives the same result as shrinking step by step, but needs only O(log n) measurements.
+    """
+    size = font.size
+    if max_width is None:
+        return TextFit(font, size, measure(text, font))
+
+    def fits(k: int) -> bool:
+        bbox = measure(text, font_variant(font, size - k * step))
+        return bbox[2] - bbox[0] <= max_width
+
+    last = max(0, -(-(size - min_size) // step))  # steps until the size reaches min_size
+    lo, hi = 0, last
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if fits(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    chosen = font_variant(font, size - lo * step)
+    return TextFit(chosen, chosen.size, measure(text, chosen))
+
+
+def text_layer(text: str, font: Font, fill: Tuple[int, ...]) -> Tuple[Image.Image, Tuple[int, int]]:
+    """
+    text rendered on a transparent RGBA layer cropped to its bounding box, and the box offset
+    from the drawing position. fill may carry an alpha; the layer composites over anything
+    the same way drawing the text there would over an opaque canvas.
+    """
+    left, top, right, bottom = measure(text, font)
+    mask = Image.new("L", (max(1, right - left), max(1, bottom - top)), 0)
+    ImageDraw.Draw(mask).text((-left, -top), text, fill=fill[3] if len(fill) == 4 else 255, font=font)
+    layer = Image.new("RGBA", mask.size, tuple(fill[:3]) + (0,))
+    layer.putalpha(mask)
+    return layer, (left, top)